@@ -1,10 +1,17 @@
 # app/__init__.py
 
+import os
+
+# Startup profiling must be installed before anything else is imported
+if os.getenv("STARTUP_PROFILE"):
+    from .profiling import install
+
+    install()
+
 from .database import SessionLocal, engine
 from .models import Base
 from .config import settings
 
-# Optional: Initialize the database connection at the package level if needed
-Base.metadata.create_all(bind=engine)
+# Schema creation happens in database.init_database(), called once at startup
 
 # You can also add common utilities or imports that you want accessible at the package level
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Hashable, Optional
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+
+def to_seconds(values) -> np.ndarray:
+    return np.asarray(values, dtype="datetime64[s]").astype(np.int64)
+
+
+def _integral(times: np.ndarray, occupancy: np.ndarray, area: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """
+    Session-seconds accumulated by the step function from the first event up to each x.
+    """
+    idx = np.searchsorted(times, x, side="right") - 1
+    safe = np.clip(idx, 0, None)
+    return np.where(idx >= 0, area[safe] + occupancy[safe] * (x - times[safe]), 0)
+
+
+def occupancy_curve(
+        starts: np.ndarray, ends: np.ndarray, range_start: int, range_end: int, bin_seconds: int
+) -> dict:
+    """
+    Sweep-line over session intervals given as epoch seconds.
+    Events are sorted once (ends before starts at equal times, so back-to-back
+    sessions do not overlap) and a cumulative sum of the +1/-1 deltas gives
+    the number of concurrent sessions after every event. Per-bin means come
+    from the integral of that step function, per-bin peaks from a max-reduce.
+    """
+    starts = np.maximum(starts, range_start)
+    ends = np.minimum(ends, range_end)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+
+    edges = np.arange(range_start, range_end, bin_seconds, dtype=np.int64)
+    edges = np.append(edges, range_end)
+    num_bins = len(edges) - 1
+
+    times = np.concatenate([starts, ends])
+    deltas = np.concatenate([np.ones(len(starts), np.int64), -np.ones(len(ends), np.int64)])
+    order = np.lexsort((deltas, times))
+    times, occupancy = times[order], np.cumsum(deltas[order])
+    area = np.concatenate([[0], np.cumsum(occupancy[:-1] * np.diff(times))]) if len(times) else np.zeros(0)
+
+    if len(times):
+        integral = _integral(times, occupancy, area, edges)
+        mean = np.diff(integral) / np.diff(edges)
+
+        # Occupancy at each bin start, raised by any event inside the bin
+        at_edge = np.searchsorted(times, edges[:-1], side="right") - 1
+        peak = np.where(at_edge >= 0, occupancy[np.clip(at_edge, 0, None)], 0)
+        # Only the count after the last event at a timestamp was actually reached
+        settled = np.append(times[:-1] != times[1:], True)
+        event_bins = np.searchsorted(edges, times, side="right") - 1
+        inside = settled & (event_bins >= 0) & (event_bins < num_bins)
+        np.maximum.at(peak, event_bins[inside], occupancy[inside])
+
+        # Busy hours: mean occupancy of every clock hour, averaged per weekday and hour
+        hours = np.arange(range_start - range_start % SECONDS_PER_HOUR, range_end, SECONDS_PER_HOUR, dtype=np.int64)
+        hour_edges = np.clip(np.append(hours, hours[-1] + SECONDS_PER_HOUR), range_start, range_end)
+        durations = np.diff(hour_edges)
+        hourly = np.diff(_integral(times, occupancy, area, hour_edges)) / np.where(durations > 0, durations, 1)
+        # 1970-01-01 was a Thursday; rows are Monday first
+        weekday = (hours // SECONDS_PER_DAY + 3) % 7
+        hour_of_day = (hours // SECONDS_PER_HOUR) % 24
+        heat = np.zeros((7, 24))
+        counts = np.zeros((7, 24))
+        valid = durations > 0
+        np.add.at(heat, (weekday[valid], hour_of_day[valid]), hourly[valid])
+        np.add.at(counts, (weekday[valid], hour_of_day[valid]), 1)
+        busy_hours = np.divide(heat, counts, out=np.zeros_like(heat), where=counts > 0)
+        overall = (integral[-1] - integral[0]) / (range_end - range_start)
+    else:
+        mean = np.zeros(num_bins)
+        peak = np.zeros(num_bins, np.int64)
+        busy_hours = np.zeros((7, 24))
+        overall = 0.0
+
+    return {
+        "bin_starts": edges[:-1],
+        "mean_occupancy": mean,
+        "peak_occupancy": peak,
+        "peak_concurrency": int(peak.max()) if num_bins else 0,
+        "mean_concurrency": float(overall),
+        "busy_hours": busy_hours,
+    }
+
+
+def session_intervals(db: Session, station_id: Optional[int], range_start: datetime, range_end: datetime):
+    """
+    Start and end times (epoch seconds) of hot and archived sessions overlapping the range.
+    Sessions still in progress are treated as ending now.
+    """
+    query = db.query(models.ChargingSession.start_time, models.ChargingSession.end_time).filter(
+        models.ChargingSession.start_time < range_end,
+        or_(models.ChargingSession.end_time.is_(None), models.ChargingSession.end_time > range_start),
+    )
+    if station_id is not None:
+        query = query.filter(models.ChargingSession.station_id == station_id)
+    rows = query.all()
+    now = datetime.utcnow()
+    starts = to_seconds([row[0] for row in rows])
+    ends = to_seconds([row[1] or now for row in rows])
+
+    from app import archive
+    # Sessions are assumed to last at most MAX_SESSION_HOURS, which bounds their
+    # start time and lets the scan skip month partitions before the range
+    archived = archive.scan_archive(
+        station_id=station_id,
+        start_time_from=range_start - timedelta(hours=settings.MAX_SESSION_HOURS),
+        start_time_to=range_end,
+        end_time_from=range_start,
+    )
+    starts = np.concatenate([starts, archived["start_time"].astype("datetime64[s]").astype(np.int64)])
+    ends = np.concatenate([ends, archived["end_time"].astype("datetime64[s]").astype(np.int64)])
+    return starts, ends
+
+
+class UtilizationCache:
+    """
+    Small LRU cache with a time-to-live for computed utilization reports.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+utilization_cache = UtilizationCache(settings.UTILIZATION_CACHE_TTL, settings.UTILIZATION_CACHE_SIZE)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from app.station import router as station_router
 from app.session import router as session_router
+from app.monitoring import router as monitoring_router
 
 api_router = APIRouter()
 
@@ -17,6 +18,12 @@ api_router.include_router(
     tags=["sessions"],   # Documentation tag for session routes
 )
 
+api_router.include_router(
+    monitoring_router,
+    prefix="/monitoring",  # Prefix for operational metrics
+    tags=["monitoring"],   # Documentation tag for monitoring routes
+)
+
 # You can easily add more routers here, for example:
 # from app.other_module import router as other_router
 # api_router.include_router(other_router, prefix="/other", tags=["other"])
@@ -0,0 +1,245 @@
+import argparse
+import fcntl
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Column name and on-disk dtype of every archived session field
+ARCHIVE_COLUMNS = [
+    ("id", "int64"),
+    ("user_id", "int64"),
+    ("station_id", "int64"),
+    ("charger_id", "int64"),
+    ("start_time", "datetime64[us]"),
+    ("end_time", "datetime64[us]"),
+    ("energy_used", "float64"),
+    ("cost", "float64"),
+]
+COLUMN_NAMES = [name for name, _ in ARCHIVE_COLUMNS]
+
+
+def _table_dir(archive_dir: str) -> str:
+    return os.path.join(archive_dir, "charging_sessions")
+
+
+def _month_of(value: np.datetime64) -> str:
+    return str(value.astype("datetime64[M]"))
+
+
+def _write_part(table_dir: str, month: str, columns: Dict[str, np.ndarray]):
+    """
+    Write one immutable partition part. Files are written to a temporary
+    directory and renamed into place so scans never see half a part.
+    """
+    month_dir = os.path.join(table_dir, f"month={month}")
+    os.makedirs(month_dir, exist_ok=True)
+    part = f"part-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = os.path.join(month_dir, f".{part}.tmp")
+    os.makedirs(tmp_dir)
+    for name in COLUMN_NAMES:
+        path = os.path.join(tmp_dir, f"{name}.npy")
+        with open(path, "wb") as f:
+            np.save(f, columns[name])
+            f.flush()
+            os.fsync(f.fileno())
+    os.rename(tmp_dir, os.path.join(month_dir, part))
+
+
+@contextmanager
+def _archive_lock(table_dir: str):
+    """
+    Exclusive lock on the archive so overlapping runs (API calls, cron) take turns.
+    """
+    os.makedirs(table_dir, exist_ok=True)
+    with open(os.path.join(table_dir, ".lock"), "w") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _session_keys(ids: np.ndarray, start_times: np.ndarray) -> List[tuple]:
+    # SQLite hands out the id of a deleted last row again, so a session is
+    # identified by its id together with its start time
+    return list(zip(ids.tolist(), start_times.astype("datetime64[us]").astype("int64").tolist()))
+
+
+def _archived_keys(table_dir: str, months: List[str], ids: np.ndarray) -> set:
+    """
+    Keys of the sessions archived in the given months whose id is among ids.
+    """
+    keys = set()
+    for month in months:
+        for part in _parts(table_dir, month, month):
+            archived_ids = np.load(os.path.join(part, "id.npy"), mmap_mode="r")
+            mask = np.isin(archived_ids, ids)
+            if mask.any():
+                start_times = np.load(os.path.join(part, "start_time.npy"), mmap_mode="r")
+                keys.update(_session_keys(np.asarray(archived_ids[mask]), np.asarray(start_times[mask])))
+    return keys
+
+
+def archive_completed_sessions(
+        db: Session, older_than_days: int, archive_dir: str = None, batch_size: int = 10000
+) -> int:
+    """
+    Move sessions that ended more than older_than_days ago into the columnar
+    archive, partitioned by the month of start_time. Returns the number of
+    sessions archived. Safe to rerun after a crash or to call concurrently:
+    runs hold a lock and sessions already in the archive are not written again.
+    """
+    table_dir = _table_dir(archive_dir or settings.ARCHIVE_DIR)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    fields = [getattr(models.ChargingSession, name) for name in COLUMN_NAMES]
+    archived = 0
+
+    with _archive_lock(table_dir):
+        while True:
+            rows = (
+                db.query(*fields)
+                .filter(
+                    models.ChargingSession.is_active == False,  # noqa: E712
+                    models.ChargingSession.end_time.isnot(None),
+                    models.ChargingSession.end_time < cutoff,
+                )
+                .order_by(models.ChargingSession.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+
+            batch = {
+                name: np.array([row[i] if row[i] is not None else 0 for row in rows], dtype=dtype)
+                for i, (name, dtype) in enumerate(ARCHIVE_COLUMNS)
+            }
+            months = batch["start_time"].astype("datetime64[M]")
+            # Rows already on disk were left behind by a run that stopped before deleting them
+            archived_keys = _archived_keys(table_dir, [_month_of(m) for m in np.unique(months)], batch["id"])
+            new = np.array(
+                [key not in archived_keys for key in _session_keys(batch["id"], batch["start_time"])], dtype=bool
+            )
+            for month in np.unique(months[new]):
+                mask = new & (months == month)
+                _write_part(table_dir, _month_of(month), {name: column[mask] for name, column in batch.items()})
+
+            # Rows are only removed once their part is safely on disk
+            ids = batch["id"].tolist()
+            db.query(models.ChargingSession).filter(models.ChargingSession.id.in_(ids)).delete(
+                synchronize_session=False
+            )
+            db.commit()
+            archived += int(new.sum())
+            logger.info(f"Archived {int(new.sum())} charging sessions, {len(ids)} removed from the hot table")
+
+    return archived
+
+
+def _parts(table_dir: str, first_month: Optional[str], last_month: Optional[str]) -> Iterator[str]:
+    if not os.path.isdir(table_dir):
+        return
+    for month_dir in sorted(os.listdir(table_dir)):
+        if not month_dir.startswith("month="):
+            continue
+        month = month_dir[len("month="):]
+        # Partition pruning on the start_time month
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+        for part in sorted(os.listdir(os.path.join(table_dir, month_dir))):
+            if part.startswith("part-"):
+                yield os.path.join(table_dir, month_dir, part)
+
+
+def scan_archive(
+        station_id: int = None,
+        user_id: int = None,
+        start_time_from: datetime = None,
+        start_time_to: datetime = None,
+        end_time_from: datetime = None,
+        end_time_to: datetime = None,
+        archive_dir: str = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Return the archived sessions matching the filters as a dict of column arrays.
+    Parts are memory-mapped, so only the pages the filters touch are read.
+    """
+    table_dir = _table_dir(archive_dir or settings.ARCHIVE_DIR)
+    bounds = {
+        "start_time_from": start_time_from,
+        "start_time_to": start_time_to,
+        "end_time_from": end_time_from,
+        "end_time_to": end_time_to,
+    }
+    bounds = {key: np.datetime64(value, "us") for key, value in bounds.items() if value is not None}
+    first_month = _month_of(bounds["start_time_from"]) if "start_time_from" in bounds else None
+    # A session cannot start after it ends, so end_time_to also bounds start_time
+    upper = [bounds[key] for key in ("start_time_to", "end_time_to") if key in bounds]
+    last_month = _month_of(min(upper)) if upper else None
+
+    selected: Dict[str, List[np.ndarray]] = {name: [] for name in COLUMN_NAMES}
+    for part in _parts(table_dir, first_month, last_month):
+        columns = {name: np.load(os.path.join(part, f"{name}.npy"), mmap_mode="r") for name in COLUMN_NAMES}
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        if station_id is not None:
+            mask &= columns["station_id"] == station_id
+        if user_id is not None:
+            mask &= columns["user_id"] == user_id
+        if "start_time_from" in bounds:
+            mask &= columns["start_time"] >= bounds["start_time_from"]
+        if "start_time_to" in bounds:
+            mask &= columns["start_time"] <= bounds["start_time_to"]
+        if "end_time_from" in bounds:
+            mask &= columns["end_time"] >= bounds["end_time_from"]
+        if "end_time_to" in bounds:
+            mask &= columns["end_time"] <= bounds["end_time_to"]
+        if not mask.any():
+            continue
+        for name in COLUMN_NAMES:
+            selected[name].append(np.asarray(columns[name][mask]))
+
+    result = {
+        name: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+        for (name, dtype), chunks in zip(ARCHIVE_COLUMNS, selected.values())
+    }
+    # A session archived twice (e.g. by an interrupted run) is only counted once
+    keys = np.stack([result["id"], result["start_time"].astype("datetime64[us]").astype("int64")], axis=1)
+    _, first = np.unique(keys, axis=0, return_index=True)
+    if len(first) < len(result["id"]):
+        first.sort()
+        result = {name: column[first] for name, column in result.items()}
+    return result
+
+
+def archive_records(columns: Dict[str, np.ndarray]) -> List[dict]:
+    """
+    Convert scanned archive columns into ChargingSession-shaped dicts.
+    """
+    values = {name: columns[name].tolist() for name in COLUMN_NAMES}
+    return [
+        dict({name: values[name][i] for name in COLUMN_NAMES}, is_active=False)
+        for i in range(len(values["id"]))
+    ]
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move completed charging sessions into the cold archive.")
+    parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Archived {archive_completed_sessions(db, args.days)} sessions")
+    finally:
+        db.close()
@@ -1,11 +1,23 @@
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
 from typing import Optional
 from .config import settings
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt", "argon2"], deprecated="auto")
+
+# passlib and jose are imported on first use so workers that never
+# authenticate (e.g. OCPP-only) do not pay for them at startup
+@lru_cache()
+def _pwd_context():
+    """
+    Password hashing configuration.
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt", "argon2"], deprecated="auto")
+
+
+def _jose():
+    from jose import JWTError, jwt
+    return jwt, JWTError
 
 # Authentication settings
 ALGORITHM = settings.JWT_ALGORITHM
@@ -18,6 +30,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Create a new JWT access token with an expiration time.
     """
+    jwt, JWTError = _jose()
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
@@ -29,6 +42,7 @@ def create_refresh_token(data: dict):
     """
     Create a new JWT refresh token with a longer expiration time.
     """
+    jwt, JWTError = _jose()
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire, "type": "refresh"})
@@ -40,6 +54,7 @@ def decode_token(token: str):
     """
     Decode a JWT token to extract the payload.
     """
+    jwt, JWTError = _jose()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -51,20 +66,21 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify if a plain password matches its hashed version.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """
     Generate a hashed version of a plain password.
     """
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 
 def is_token_expired(token: str) -> bool:
     """
     Check if a JWT token has expired.
     """
+    jwt, JWTError = _jose()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         exp = payload.get("exp")
@@ -79,6 +95,7 @@ def renew_access_token(refresh_token: str):
     """
     Renew an access token using a valid refresh token.
     """
+    jwt, JWTError = _jose()
     try:
         payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
         if payload.get("type") != "refresh":
@@ -95,6 +112,7 @@ def validate_token(token: str, expected_type: str = "access") -> dict:
     """
     Validate a JWT token and ensure it matches the expected type.
     """
+    jwt, JWTError = _jose()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         if payload.get("type") != expected_type:
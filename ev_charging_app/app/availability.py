@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app import models
+
+
+class ChargerAvailability:
+    """
+    In-memory index of busy chargers, one bitmap per station.
+    Bit (charger_id - 1) is set while that charger has an active session, so
+    finding a free charger is a couple of integer operations instead of a
+    scan over sessions. The unique partial index on active sessions stays the
+    source of truth; this index only decides which charger to try first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._capacity: Dict[int, int] = {}
+        self._busy: Dict[int, int] = {}
+
+    def rebuild(self, db: Session):
+        """
+        Load capacities and active sessions from the database.
+        """
+        capacity = {
+            station_id: num_chargers or 1
+            for station_id, num_chargers in db.query(models.Station.id, models.Station.num_chargers)
+        }
+        busy: Dict[int, int] = {}
+        active = db.query(models.ChargingSession.station_id, models.ChargingSession.charger_id).filter(
+            models.ChargingSession.is_active == True  # noqa: E712
+        )
+        for station_id, charger_id in active:
+            busy[station_id] = busy.get(station_id, 0) | (1 << (charger_id - 1))
+        with self._lock:
+            self._capacity = capacity
+            self._busy = busy
+
+    def refresh_station(self, db: Session, station_id: int, num_chargers: int):
+        """
+        Reload one station's bitmap, e.g. after other workers released chargers.
+        """
+        busy = 0
+        active = db.query(models.ChargingSession.charger_id).filter(
+            models.ChargingSession.station_id == station_id,
+            models.ChargingSession.is_active == True,  # noqa: E712
+        )
+        for (charger_id,) in active:
+            busy |= 1 << (charger_id - 1)
+        with self._lock:
+            self._capacity[station_id] = num_chargers or 1
+            self._busy[station_id] = busy
+
+    def set_capacity(self, station_id: int, num_chargers: int):
+        with self._lock:
+            self._capacity[station_id] = num_chargers or 1
+
+    def forget(self, station_id: int):
+        with self._lock:
+            self._capacity.pop(station_id, None)
+            self._busy.pop(station_id, None)
+
+    def reserve(self, station_id: int, num_chargers: int, charger_id: Optional[int] = None) -> Optional[int]:
+        """
+        Mark a charger busy and return its id, or None if it (or every charger) is taken.
+        Without a charger_id the lowest free charger is chosen.
+        """
+        capacity = num_chargers or 1
+        with self._lock:
+            self._capacity[station_id] = capacity
+            busy = self._busy.get(station_id, 0)
+            free = ~busy & ((1 << capacity) - 1)
+            if charger_id is None:
+                if not free:
+                    return None
+                bit = free & -free  # lowest set bit
+                charger_id = bit.bit_length()
+            else:
+                bit = 1 << (charger_id - 1)
+                if not free & bit:
+                    return None
+            self._busy[station_id] = busy | bit
+            return charger_id
+
+    def release(self, station_id: int, charger_id: int):
+        with self._lock:
+            if station_id in self._busy:
+                self._busy[station_id] &= ~(1 << (charger_id - 1))
+
+    def free_count(self, station_id: int) -> int:
+        """
+        Number of chargers without an active session, as far as this worker knows.
+        """
+        with self._lock:
+            capacity = self._capacity.get(station_id, 0)
+            busy = self._busy.get(station_id, 0) & ((1 << capacity) - 1)
+            return capacity - bin(busy).count("1")
+
+
+charger_availability = ChargerAvailability()
@@ -9,5 +9,45 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your_secret_key_here")  # default to a dummy value
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    RATE_PER_KWH: float = float(os.getenv("RATE_PER_KWH", "0.25"))  # Price charged per kWh delivered
+
+    # Cross-worker OCPP command routing ("memory", "unix" or "redis")
+    OCPP_ROUTER_BACKEND: str = os.getenv("OCPP_ROUTER_BACKEND", "memory")
+    OCPP_ROUTER_SOCKET_DIR: str = os.getenv("OCPP_ROUTER_SOCKET_DIR", "/tmp/ev_charging_ocpp")
+    OCPP_COMMAND_TIMEOUT: float = float(os.getenv("OCPP_COMMAND_TIMEOUT", "30"))
+    OCPP_MAX_INFLIGHT_CALLS: int = int(os.getenv("OCPP_MAX_INFLIGHT_CALLS", "1"))  # OCPP 1.6 allows one
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    WORKER_ID: str = os.getenv("WORKER_ID", "")  # defaults to "<hostname>-<pid>" when empty
+
+    # Cold archive for completed charging sessions
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "./archive")
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+
+    # Admission control: token bucket rate (per second) and burst size
+    RATE_LIMIT_OCPP_RATE: float = float(os.getenv("RATE_LIMIT_OCPP_RATE", "5"))  # per charge point
+    RATE_LIMIT_OCPP_BURST: float = float(os.getenv("RATE_LIMIT_OCPP_BURST", "20"))
+    RATE_LIMIT_API_RATE: float = float(os.getenv("RATE_LIMIT_API_RATE", "20"))  # per API client
+    RATE_LIMIT_API_BURST: float = float(os.getenv("RATE_LIMIT_API_BURST", "50"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))  # buckets kept per limiter
+
+    # In-memory station indexes are per worker; rebuild them after this many seconds
+    GEO_INDEX_MAX_AGE: float = float(os.getenv("GEO_INDEX_MAX_AGE", "60"))  # 0 disables
+    SEARCH_INDEX_MAX_AGE: float = float(os.getenv("SEARCH_INDEX_MAX_AGE", "60"))  # without FTS5 only
+
+    # Station utilization reports are cached per (station, range, bin)
+    UTILIZATION_CACHE_TTL: float = float(os.getenv("UTILIZATION_CACHE_TTL", "60"))  # seconds
+    UTILIZATION_CACHE_SIZE: int = int(os.getenv("UTILIZATION_CACHE_SIZE", "1024"))
+    UTILIZATION_MAX_BINS: int = int(os.getenv("UTILIZATION_MAX_BINS", "10000"))
+    MAX_SESSION_HOURS: float = float(os.getenv("MAX_SESSION_HOURS", "168"))  # longest session scanned for
+
+    # List endpoints that skip ORM hydration and serialize column tuples directly
+    FAST_JSON_ENDPOINTS: set = {
+        name.strip()
+        for name in os.getenv(
+            "FAST_JSON_ENDPOINTS", "get_all_sessions,get_user_sessions,get_station_sessions,list_stations"
+        ).split(",")
+        if name.strip()
+    }
 
 settings = Settings()
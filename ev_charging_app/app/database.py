@@ -1,10 +1,101 @@
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, inspect, select, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = "sqlite:///./test.db"  # Replace with your actual DB URL
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+# Bump whenever models or their indexes change so existing databases get upgraded
+SCHEMA_VERSION = 1
+
+# Kept outside Base.metadata so checking the stamp never touches the model tables
+schema_version_table = Table(
+    "schema_version", MetaData(), Column("version", Integer, nullable=False)
+)
+
+_schema_ready = False
+
+
+def _missing_required_columns(connection):
+    """
+    NOT NULL columns missing from existing tables; these cannot be added without
+    a value for the rows already stored, so they need a manual migration.
+    """
+    inspector = inspect(connection)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(
+            f"{table.name}.{column.name}"
+            for column in table.columns
+            if column.name not in existing and not column.nullable
+        )
+    return missing
+
+
+def _upgrade_existing_tables(connection) -> bool:
+    """
+    Add nullable columns and indexes that create_all skips on tables that already exist.
+    Returns False if an index had to be skipped because its columns are missing.
+    """
+    inspector = inspect(connection)
+    complete = True
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                existing.add(column.name)
+                logger.info(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            if not {column.name for column in index.columns} <= existing:
+                logger.warning(f"Skipped index {index.name}: columns missing from {table.name}")
+                complete = False
+                continue
+            index.create(connection, checkfirst=True)
+    return complete
+
+
+def init_database():
+    """
+    Create or upgrade the schema, at most once per process.
+    When the stored schema version matches SCHEMA_VERSION nothing else is checked.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+
+    from app import models  # noqa: F401 - registers the model tables on Base
+
+    with engine.begin() as connection:
+        current = None
+        if inspect(connection).has_table(schema_version_table.name):
+            current = connection.execute(select(schema_version_table.c.version)).scalar()
+        if current != SCHEMA_VERSION:
+            logger.info(f"Upgrading database schema from version {current} to {SCHEMA_VERSION}")
+            # Checked before anything is changed, since SQLite commits DDL right away
+            missing = _missing_required_columns(connection)
+            if missing:
+                raise RuntimeError(
+                    f"Manual migration required: existing tables lack NOT NULL columns {', '.join(missing)}"
+                )
+            Base.metadata.create_all(bind=connection)
+            if _upgrade_existing_tables(connection):
+                schema_version_table.create(connection, checkfirst=True)
+                connection.execute(schema_version_table.delete())
+                connection.execute(schema_version_table.insert().values(version=SCHEMA_VERSION))
+            else:
+                # No stamp after a partial upgrade, so it is retried on the next start
+                logger.warning(f"Database schema only partially upgraded to version {SCHEMA_VERSION}")
+
+    _schema_ready = True
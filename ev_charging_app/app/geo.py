@@ -0,0 +1,218 @@
+import heapq
+import math
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app import models
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance between two points in kilometres.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return _haversine_distance(a)
+
+
+def _haversine_distance(a: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    In-memory spatial index of station coordinates on a fixed lat/lon grid.
+    A radius query only visits the cells overlapping the search circle's
+    bounding box, so its cost depends on local density, not fleet size.
+
+    Every worker process keeps its own index and only sees the station
+    changes made through it; refresh_if_stale rebuilds it from the database
+    periodically so changes made through other workers show up as well.
+    """
+
+    def __init__(self, cell_degrees: float = 0.1):
+        self.cell_degrees = cell_degrees
+        self._columns = int(math.ceil(360 / cell_degrees))
+        self._lock = threading.Lock()
+        # station_id -> (lat, lon, cos(lat)); the cosine is reused by every query
+        self._cells: Dict[Tuple[int, int], Dict[int, Tuple[float, float, float]]] = {}
+        self._points: Dict[int, Tuple[float, float, float]] = {}
+        self._built_at = float("-inf")
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = int(math.floor(lat / self.cell_degrees))
+        column = int(math.floor((lon + 180) / self.cell_degrees)) % self._columns
+        return row, column
+
+    def rebuild(self, db: Session):
+        """
+        Load all station coordinates from the database.
+        """
+        rows = db.query(models.Station.id, models.Station.latitude, models.Station.longitude).filter(
+            models.Station.latitude.isnot(None), models.Station.longitude.isnot(None)
+        )
+        with self._lock:
+            self._cells = {}
+            self._points = {}
+            for station_id, lat, lon in rows:
+                self._add(station_id, lat, lon)
+            self._built_at = time.monotonic()
+
+    def refresh_if_stale(self, db: Session, max_age: float):
+        """
+        Rebuild from the database once the index is older than max_age seconds (0 disables).
+        """
+        if max_age <= 0:
+            return
+        with self._lock:
+            if time.monotonic() - self._built_at <= max_age:
+                return
+            # Claimed up front so concurrent requests do not all rebuild
+            self._built_at = time.monotonic()
+        self.rebuild(db)
+
+    def _add(self, station_id: int, lat: float, lon: float):
+        point = (lat, lon, math.cos(math.radians(lat)))
+        self._points[station_id] = point
+        self._cells.setdefault(self._cell(lat, lon), {})[station_id] = point
+
+    def _remove(self, station_id: int):
+        point = self._points.pop(station_id, None)
+        if point is None:
+            return
+        cell = self._cell(point[0], point[1])
+        members = self._cells.get(cell)
+        if members is not None:
+            members.pop(station_id, None)
+            if not members:
+                del self._cells[cell]
+
+    def upsert(self, station_id: int, lat: Optional[float], lon: Optional[float]):
+        with self._lock:
+            self._remove(station_id)
+            if lat is not None and lon is not None:
+                self._add(station_id, lat, lon)
+
+    def remove(self, station_id: int):
+        with self._lock:
+            self._remove(station_id)
+
+    @staticmethod
+    def _ring(row: int, column: int, ring: int, rows: Tuple[int, int], columns: Tuple[int, int]) -> Iterator[Tuple[int, int]]:
+        """
+        Cells at Chebyshev distance ring from (row, column) inside the given
+        row and (unwrapped) column ranges.
+        """
+        first_column, last_column = max(column - ring, columns[0]), min(column + ring, columns[1])
+        for edge_row in {row - ring, row + ring}:
+            if rows[0] <= edge_row <= rows[1]:
+                for edge_column in range(first_column, last_column + 1):
+                    yield edge_row, edge_column
+        first_row, last_row = max(row - ring + 1, rows[0]), min(row + ring - 1, rows[1])
+        for edge_column in {column - ring, column + ring}:
+            if ring and columns[0] <= edge_column <= columns[1]:
+                for edge_row in range(first_row, last_row + 1):
+                    yield edge_row, edge_column
+
+    def _outside_a(self, lat: float, lon: float, row: int, column: int, ring: int, cos_lat: float, cos_band: float) -> float:
+        """
+        Lower bound on the haversine term a for stations outside the rings up to
+        ring, whose latitude lies within the band with cosine at least cos_band.
+        """
+        low_lat, high_lat = (row - ring) * self.cell_degrees, (row + ring + 1) * self.cell_degrees
+        lat_gaps = [gap for gap, beyond in ((lat - low_lat, low_lat > -90.0), (high_lat - lat, high_lat < 90.0)) if beyond]
+        a_lat = math.sin(math.radians(min(lat_gaps)) / 2) ** 2 if lat_gaps else math.inf
+        if 2 * ring + 1 >= self._columns:
+            return a_lat
+        low_lon = (column - ring) * self.cell_degrees - 180
+        high_lon = (column + ring + 1) * self.cell_degrees - 180
+        lon_gap = min(180.0, lon - low_lon, high_lon - lon)
+        return min(a_lat, cos_lat * cos_band * math.sin(math.radians(lon_gap) / 2) ** 2)
+
+    def nearby(self, lat: float, lon: float, radius_km: float, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Return (station_id, distance_km) pairs within the radius, nearest first.
+        With a limit the grid is searched ring by ring outwards from the cell of
+        the point, stopping once no cell further out can hold a station nearer
+        than the limit-th match found so far. When the search box has more cells
+        than the index has occupied ones, the occupied cells are scanned instead.
+        """
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        cos_lat = math.cos(math.radians(lat))
+        if abs(lat) + dlat >= 90.0:
+            dlon = 180.0  # the circle contains a pole
+        else:
+            dlon = math.degrees(math.asin(min(1.0, math.sin(math.radians(dlat)) / cos_lat)))
+
+        min_row, _ = self._cell(max(-90.0, lat - dlat), lon)
+        max_row, _ = self._cell(min(90.0, lat + dlat), lon)
+        first_column = int(math.floor((lon - dlon + 180) / self.cell_degrees))
+        last_column = int(math.floor((lon + dlon + 180) / self.cell_degrees))
+
+        # Candidates are compared on the haversine term a, which grows with the
+        # distance, so asin/sqrt only run for the stations actually returned
+        max_a = math.sin(min(math.pi / 2, radius_km / (2 * EARTH_RADIUS_KM))) ** 2
+        phi = math.radians(lat)
+
+        def score(cell: Tuple[int, int]) -> Iterator[Tuple[float, int]]:
+            for station_id, (station_lat, station_lon, station_cos) in self._cells.get(cell, {}).items():
+                a = (
+                    math.sin((math.radians(station_lat) - phi) / 2) ** 2
+                    + cos_lat * station_cos * math.sin(math.radians(station_lon - lon) / 2) ** 2
+                )
+                if a <= max_a:
+                    yield a, station_id
+
+        if limit is not None and limit <= 0:
+            return []
+        width = last_column - first_column
+        box_cells = (max_row - min_row + 1) * min(width + 1, self._columns)
+        with self._lock:
+            if limit is not None and box_cells <= len(self._cells):
+                row, _ = self._cell(lat, lon)
+                column = int(math.floor((lon + 180) / self.cell_degrees))
+                # Stations within the radius are at most dlat away from the point's latitude
+                cos_band = math.cos(math.radians(min(90.0, abs(lat) + dlat)))
+                best: List[Tuple[float, int]] = []  # (-a, -station_id): the worst kept match on top
+                # Only a box spanning all longitudes can reach a cell twice
+                visited = set() if width + 1 > self._columns else None
+                rings = max(row - min_row, max_row - row, column - first_column, last_column - column)
+                for ring in range(rings + 1):
+                    for cell_row, cell_column in self._ring(row, column, ring, (min_row, max_row), (first_column, last_column)):
+                        cell = (cell_row, cell_column % self._columns)
+                        if cell not in self._cells:
+                            continue
+                        if visited is not None:
+                            if cell in visited:
+                                continue
+                            visited.add(cell)
+                        for a, station_id in score(cell):
+                            if len(best) < limit:
+                                heapq.heappush(best, (-a, -station_id))
+                            elif (-a, -station_id) > best[0]:
+                                heapq.heapreplace(best, (-a, -station_id))
+                    if len(best) == limit and -best[0][0] < self._outside_a(lat, lon, row, column, ring, cos_lat, cos_band):
+                        break
+                nearest = sorted((-a, -station_id) for a, station_id in best)
+            else:
+                if box_cells > len(self._cells):
+                    # Fewer occupied cells than cells in the box (sparse data, or near a pole)
+                    cells = [
+                        cell for cell in self._cells
+                        if min_row <= cell[0] <= max_row and (cell[1] - first_column) % self._columns <= width
+                    ]
+                else:
+                    columns = {column % self._columns for column in range(first_column, last_column + 1)}
+                    cells = [(row, column) for row in range(min_row, max_row + 1) for column in columns]
+                matches = [match for cell in cells for match in score(cell)]
+                nearest = heapq.nsmallest(limit, matches) if limit is not None else sorted(matches)
+        return [(station_id, _haversine_distance(a)) for a, station_id in nearest]
+
+
+station_locations = GridIndex()
@@ -1,9 +1,16 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from app import models, database
+from fastapi.responses import JSONResponse
+from app import database, profiling
 from app.api_router import api_router  # Ensure api_router correctly includes all API routes
 from app.ocpp_server import ocpp_server
+from app.routing import command_router
+from app.availability import charger_availability
+from app.geo import station_locations
+from app.search import station_search
+from app.ratelimit import api_limiter
 import logging
+import math
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +32,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admission control for REST routes, one token bucket per client address.
+# X-API-Key is not verified anywhere yet, so keying on it would let a client
+# get a fresh bucket (and evict others from the LRU) just by rotating it.
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    if request.url.path.startswith("/api"):
+        client = request.client.host if request.client else "unknown"
+        retry_after = api_limiter.acquire(client)
+        if retry_after:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+    return await call_next(request)
+
 # Database initialization
 @app.on_event("startup")
 async def startup_event():
@@ -33,8 +56,22 @@ async def startup_event():
     Ensures the database is initialized.
     """
     logger.info("Starting application...")
-    models.Base.metadata.create_all(bind=database.engine)
+    with profiling.step("database.init_database"):
+        database.init_database()
     logger.info("Database initialized successfully.")
+    db = database.SessionLocal()
+    try:
+        with profiling.step("charger_availability.rebuild"):
+            charger_availability.rebuild(db)
+        with profiling.step("station_locations.rebuild"):
+            station_locations.rebuild(db)
+        with profiling.step("station_search.setup"):
+            station_search.setup(database.engine, db)
+    finally:
+        db.close()
+    with profiling.step("command_router.start"):
+        await command_router.start()
+    profiling.report()
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -43,6 +80,7 @@ async def shutdown_event():
     Cleans up any resources if necessary.
     """
     logger.info("Shutting down application...")
+    await command_router.stop()
 
 # Include API routers
 app.include_router(api_router, prefix="/api", tags=["API Routes"])
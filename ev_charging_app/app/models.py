@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -9,6 +9,8 @@ class Station(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)  # Name of the station
     location = Column(String, nullable=False, index=True)  # Physical location
+    latitude = Column(Float, nullable=True)  # WGS84 latitude in degrees
+    longitude = Column(Float, nullable=True)  # WGS84 longitude in degrees
     power_output = Column(Float, nullable=False)  # Maximum power output in kW
     ocpp_id = Column(String, unique=True, nullable=False, index=True)  # Unique OCPP identifier
     status = Column(String, default="Available")  # Status (e.g., Available, InUse, Offline)
@@ -36,6 +38,18 @@ class ChargingSession(Base):
     cost = Column(Float, default=0.0)  # Cost of the session
     is_active = Column(Boolean, default=True)  # Whether the session is currently active
 
+    # At most one active session per charger
+    __table_args__ = (
+        Index(
+            "uq_charging_sessions_active_charger",
+            station_id,
+            charger_id,
+            unique=True,
+            sqlite_where=is_active == True,  # noqa: E712
+            postgresql_where=is_active == True,  # noqa: E712
+        ),
+    )
+
     # Relationships
     station = relationship("Station", back_populates="sessions")
 
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from app.ratelimit import api_limiter, ocpp_limiter
+
+router = APIRouter()
+
+
+@router.get("/admission")
+def admission_stats():
+    """
+    Admitted and rejected counts of the OCPP and REST token bucket limiters.
+    """
+    return {"ocpp": ocpp_limiter.stats(), "api": api_limiter.stats()}
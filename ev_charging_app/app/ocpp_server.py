@@ -1,6 +1,12 @@
 from fastapi import WebSocket, WebSocketDisconnect
+import asyncio
 import json
+import uuid
 from datetime import datetime
+from typing import Dict, Optional
+from app.config import settings
+from app.ratelimit import ocpp_limiter
+from app.routing import command_router, CommandError, ChargePointNotConnected
 
 # Sample charger details
 charger_details = {
@@ -10,71 +16,182 @@ charger_details = {
     "firmware_version": "v1.0.3"
 }
 
-async def ocpp_server(websocket: WebSocket):
+# OCPP-J message type ids
+CALL = 2
+CALLRESULT = 3
+CALLERROR = 4
+
+
+class FormationViolation(Exception):
+    """
+    Raised when an incoming frame is not a valid OCPP-J message.
+    """
+
+
+def parse_message(message: str) -> list:
+    """
+    Parse an OCPP-J frame into a list starting with its messageTypeId.
+    Objects with messageTypeId/uniqueId keys are accepted for older clients.
+    """
+    try:
+        frame = json.loads(message)
+    except json.JSONDecodeError:
+        raise FormationViolation("Invalid JSON format")
+
+    if isinstance(frame, dict) and "messageTypeId" in frame:
+        if frame["messageTypeId"] == CALL:
+            frame = [CALL, frame.get("uniqueId"), frame.get("action"), frame.get("payload", {})]
+        else:
+            frame = [frame["messageTypeId"], frame.get("uniqueId"), frame.get("payload", {})]
+
+    if not isinstance(frame, list) or len(frame) < 3 or frame[0] not in (CALL, CALLRESULT, CALLERROR):
+        raise FormationViolation("Message is not an OCPP-J CALL, CALLRESULT or CALLERROR")
+    if not isinstance(frame[1], str):
+        raise FormationViolation("uniqueId must be a string")
+    if frame[0] == CALL and len(frame) < 4:
+        raise FormationViolation("CALL is missing its payload")
+    return frame
+
+
+def call_error(unique_id: str, code: str, description: str, details: Optional[dict] = None) -> list:
+    return [CALLERROR, unique_id, code, description, details or {}]
+
+
+def handle_call(action: str, payload: dict) -> dict:
+    """
+    Build the CALLRESULT payload for a CALL sent by the charge point.
+    """
+    if action == "BootNotification":
+        print("[SERVER] Handling BootNotification")
+        return {
+            "currentTime": datetime.utcnow().isoformat(),
+            "interval": 300,
+            "status": "Accepted",
+        }
+    elif action == "MeterValues":
+        print("[SERVER] Handling MeterValues")
+        return {"status": "Accepted"}
+    elif action == "StatusNotification":
+        print("[SERVER] Handling StatusNotification")
+        return {"status": "Accepted"}
+    raise CommandError("NotSupported", f"Action '{action}' is not supported.")
+
+
+class ChargePointConnection:
+    """
+    Server side of one charge point's WebSocket. Keeps the map of uniqueId to
+    Future for server-initiated CALLs so that results can arrive in any order.
+    """
+
+    def __init__(self, websocket: WebSocket, charge_point_id: str, max_inflight: int = None):
+        self.websocket = websocket
+        self.charge_point_id = charge_point_id
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._slots = asyncio.Semaphore(max_inflight or settings.OCPP_MAX_INFLIGHT_CALLS)
+        self.closed = False
+
+    async def send(self, frame: list):
+        await self.websocket.send_text(json.dumps(frame))
+
+    async def call(self, action: str, payload: dict, timeout: Optional[float] = None) -> dict:
+        """
+        Send a CALL and wait for the matching CALLRESULT payload.
+        Waiting for a free in-flight slot counts against the timeout.
+        """
+        timeout = timeout or settings.OCPP_COMMAND_TIMEOUT
+        try:
+            return await asyncio.wait_for(self._call(action, payload), timeout)
+        except asyncio.TimeoutError:
+            raise CommandError("Timeout", f"{action} to '{self.charge_point_id}' timed out after {timeout}s")
+
+    async def _call(self, action: str, payload: dict) -> dict:
+        async with self._slots:
+            # Calls still queued for a slot when the socket went away must not send on it
+            if self.closed:
+                raise ChargePointNotConnected(self.charge_point_id)
+            unique_id = uuid.uuid4().hex
+            future = asyncio.get_running_loop().create_future()
+            self._pending[unique_id] = future
+            try:
+                await self.send([CALL, unique_id, action, payload])
+                print(f"[SERVER] Sent {action} to {self.charge_point_id}")
+                return await future
+            finally:
+                self._pending.pop(unique_id, None)
+
+    def resolve(self, frame: list):
+        """
+        Complete the pending CALL that a CALLRESULT or CALLERROR answers.
+        """
+        future = self._pending.get(frame[1])
+        if future is None or future.done():
+            print(f"[SERVER] No pending call for uniqueId {frame[1]}")
+            return
+        if frame[0] == CALLRESULT:
+            future.set_result(frame[2])
+        else:
+            description = frame[3] if len(frame) > 3 else ""
+            future.set_exception(CommandError(frame[2], description))
+
+    def close(self):
+        self.closed = True
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ChargePointNotConnected(self.charge_point_id))
+        self._pending.clear()
+
+
+async def ocpp_server(websocket: WebSocket, charge_point_id: str):
     """
     Handles OCPP WebSocket communication with a client.
+    The connection is registered with the command router so that commands
+    issued on any worker reach this charge point.
     """
-    await websocket.accept()
-    print("[SERVER] Client connected")
+    print(f"[SERVER] Client connected: {charge_point_id}")
+    connection = ChargePointConnection(websocket, charge_point_id)
 
+    await command_router.attach(charge_point_id, connection.call)
     try:
         while True:
             # Receive incoming OCPP message
             message = await websocket.receive_text()
             print(f"[SERVER] Received: {message}")
 
-            # Parse the incoming message as JSON
             try:
-                ocpp_message = json.loads(message)
-                action = ocpp_message.get("action")
-                payload = ocpp_message.get("payload", {})
-
-                # Handle specific OCPP actions
-                if action == "BootNotification":
-                    print("[SERVER] Handling BootNotification")
-                    response = {
-                        "action": "BootNotificationResponse",
-                        "payload": {
-                            "currentTime": datetime.utcnow().isoformat(),
-                            "interval": 300,
-                            "status": "Accepted",
-                        },
-                    }
-                elif action == "MeterValues":
-                    print("[SERVER] Handling MeterValues")
-                    response = {
-                        "action": "MeterValuesResponse",
-                        "payload": {
-                            "status": "Accepted"
-                        },
-                    }
-                elif action == "StatusNotification":
-                    print("[SERVER] Handling StatusNotification")
-                    response = {
-                        "action": "StatusNotificationResponse",
-                        "payload": {
-                            "status": "Accepted"
-                        },
-                    }
-                else:
-                    print("[SERVER] Unknown action received")
-                    response = {
-                        "action": "Error",
-                        "payload": {
-                            "errorCode": "NotSupported",
-                            "errorDescription": f"Action '{action}' is not supported."
-                        },
-                    }
-
-                # Send the response back to the client
-                await websocket.send_text(json.dumps(response))
-                print(f"[SERVER] Sent: {response}")
-
-            except json.JSONDecodeError:
-                print("[SERVER] Invalid JSON received")
-                await websocket.send_text(
-                    json.dumps({"error": "Invalid JSON format"})
-                )
+                frame = parse_message(message)
+            except FormationViolation as e:
+                print(f"[SERVER] {e}")
+                # Garbage counts against the budget too; once over it, drop it unanswered
+                if not ocpp_limiter.acquire(charge_point_id):
+                    await connection.send(call_error("", "FormationViolation", str(e)))
+                continue
+
+            # Results of our own CALLs complete the waiting Future
+            if frame[0] != CALL:
+                connection.resolve(frame)
+                continue
+
+            _, unique_id, action, payload = frame[:4]
+            retry_after = ocpp_limiter.acquire(charge_point_id)
+            if retry_after:
+                print(f"[SERVER] Rate limit exceeded by {charge_point_id}, rejecting {action}")
+                await connection.send(call_error(
+                    unique_id, "GenericError", "Rate limit exceeded", {"retryAfter": round(retry_after, 3)}
+                ))
+                continue
+
+            try:
+                response = [CALLRESULT, unique_id, handle_call(action, payload)]
+            except CommandError as e:
+                print(f"[SERVER] Unknown action received: {action}")
+                response = call_error(unique_id, e.code, e.description)
+
+            # Send the response back to the client
+            await connection.send(response)
+            print(f"[SERVER] Sent: {response}")
 
     except WebSocketDisconnect:
         print("[SERVER] Client disconnected")
+    finally:
+        connection.close()
+        await command_router.detach(charge_point_id, connection.call)
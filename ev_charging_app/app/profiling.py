@@ -0,0 +1,115 @@
+import importlib.abc
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _TimedLoader:
+    """
+    Wraps a module loader and reports how long executing the module took.
+    """
+
+    def __init__(self, loader, name: str, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter()
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(self._name, time.perf_counter() - start)
+
+
+class StartupProfiler(importlib.abc.MetaPathFinder):
+    """
+    Records per-module import time (inclusive and self) and the duration of
+    named startup steps.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: Dict[str, Tuple[float, float]] = {}
+        self.steps: List[Tuple[str, float]] = []
+        self._children: List[float] = []
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, fullname, self)
+            return spec
+        return None
+
+    def _enter(self):
+        self._children.append(0.0)
+
+    def _exit(self, name: str, elapsed: float):
+        children = self._children.pop()
+        self.imports[name] = (elapsed, elapsed - children)
+        if self._children:
+            self._children[-1] += elapsed
+
+    def report(self, top: int = 25):
+        lines = [f"Startup profile: ready after {(time.perf_counter() - self.started) * 1000:.1f} ms"]
+        lines.append("  init steps:")
+        for name, elapsed in self.steps:
+            lines.append(f"    {elapsed * 1000:9.1f} ms  {name}")
+        lines.append(f"  slowest imports (self / inclusive), top {top}:")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for name, (inclusive, own) in slowest:
+            lines.append(f"    {own * 1000:9.1f} / {inclusive * 1000:9.1f} ms  {name}")
+        logger.info("\n".join(lines))
+
+
+profiler = None
+
+
+def install():
+    """
+    Start recording import times for every module imported from now on.
+    """
+    global profiler
+    if profiler is None:
+        profiler = StartupProfiler()
+        sys.meta_path.insert(0, profiler)
+
+
+@contextmanager
+def step(name: str):
+    """
+    Time one startup step; does nothing unless profiling is installed.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.steps.append((name, time.perf_counter() - start))
+
+
+def report():
+    """
+    Log the collected profile and stop recording imports.
+    """
+    if profiler is None:
+        return
+    profiler.report()
+    if profiler in sys.meta_path:
+        sys.meta_path.remove(profiler)
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+from app.config import settings
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by client (charge point id, API client, ...).
+    Buckets refill lazily from the elapsed time when they are touched, so
+    admission is O(1), and at most max_keys buckets are kept: the least
+    recently seen one is evicted first. An evicted client simply starts
+    again with a full bucket, which it would have had after idling anyway.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [tokens, last refill time, rejected count]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """
+        Take tokens for one request. Returns 0.0 when admitted, otherwise the
+        number of seconds until enough tokens will be available.
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.admitted += 1
+                return 0.0
+            bucket[2] += 1
+            self.rejected += 1
+            return (cost - bucket[0]) / self.rate
+
+    def stats(self, top: int = 10) -> dict:
+        """
+        Counters for monitoring, including the tracked clients rejected most often.
+        """
+        with self._lock:
+            offenders = sorted(
+                ((key, int(bucket[2])) for key, bucket in self._buckets.items() if bucket[2]),
+                key=lambda item: item[1],
+                reverse=True,
+            )[:top]
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tracked_keys": len(self._buckets),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "top_rejected": [{"key": key, "rejected": count} for key, count in offenders],
+            }
+
+
+ocpp_limiter = TokenBucketLimiter(
+    settings.RATE_LIMIT_OCPP_RATE, settings.RATE_LIMIT_OCPP_BURST, settings.RATE_LIMIT_MAX_KEYS
+)
+api_limiter = TokenBucketLimiter(
+    settings.RATE_LIMIT_API_RATE, settings.RATE_LIMIT_API_BURST, settings.RATE_LIMIT_MAX_KEYS
+)
@@ -0,0 +1,418 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+from urllib.parse import quote
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# A local command handler sends one command to a charger connected to this worker
+CommandHandler = Callable[[str, dict, float], Awaitable[dict]]
+# A forwarded-message handler answers command envelopes coming from other workers
+EnvelopeHandler = Callable[[dict], Awaitable[dict]]
+
+
+class CommandError(Exception):
+    """
+    Raised when a command cannot be delivered to, or is rejected by, a charge point.
+    """
+
+    def __init__(self, code: str, description: str = ""):
+        super().__init__(f"{code}: {description}" if description else code)
+        self.code = code
+        self.description = description
+
+
+class ChargePointNotConnected(CommandError):
+    """
+    Raised when no worker currently holds a connection for the charge point.
+    """
+
+    def __init__(self, charge_point_id: str):
+        super().__init__("NotConnected", f"Charge point '{charge_point_id}' is not connected")
+        self.charge_point_id = charge_point_id
+
+
+class CommandTransport(ABC):
+    """
+    Base class for transports that record charge point ownership and move
+    command envelopes between workers.
+    """
+
+    @abstractmethod
+    async def start(self, worker_id: str, handler: EnvelopeHandler):
+        """Begin accepting envelopes addressed to worker_id."""
+
+    @abstractmethod
+    async def stop(self):
+        """Stop accepting envelopes and release transport resources."""
+
+    @abstractmethod
+    async def claim(self, charge_point_id: str, worker_id: str):
+        """Record worker_id as the owner of the charge point's connection."""
+
+    @abstractmethod
+    async def release(self, charge_point_id: str, worker_id: str):
+        """Drop the ownership record, unless another worker has claimed it since."""
+
+    @abstractmethod
+    async def owner(self, charge_point_id: str) -> Optional[str]:
+        """Return the worker currently owning the charge point, if any."""
+
+    @abstractmethod
+    async def forward(self, worker_id: str, message: dict, timeout: float) -> dict:
+        """Deliver an envelope to worker_id and return its reply."""
+
+
+class InMemoryTransport(CommandTransport):
+    """
+    Transport for routers living in the same process (single worker, tests).
+    _owners and _workers are deliberately class-level: every instance in the
+    process shares them, which is what lets several routers in one process
+    find each other.
+    """
+
+    _owners: Dict[str, str] = {}
+    _workers: Dict[str, EnvelopeHandler] = {}
+
+    async def start(self, worker_id: str, handler: EnvelopeHandler):
+        self._worker_id = worker_id
+        self._workers[worker_id] = handler
+
+    async def stop(self):
+        self._workers.pop(self._worker_id, None)
+
+    async def claim(self, charge_point_id: str, worker_id: str):
+        self._owners[charge_point_id] = worker_id
+
+    async def release(self, charge_point_id: str, worker_id: str):
+        if self._owners.get(charge_point_id) == worker_id:
+            del self._owners[charge_point_id]
+
+    async def owner(self, charge_point_id: str) -> Optional[str]:
+        return self._owners.get(charge_point_id)
+
+    async def forward(self, worker_id: str, message: dict, timeout: float) -> dict:
+        handler = self._workers.get(worker_id)
+        if handler is None:
+            raise ChargePointNotConnected(message["charge_point_id"])
+        return await asyncio.wait_for(handler(message), timeout)
+
+
+class UnixSocketTransport(CommandTransport):
+    """
+    Transport for several workers on one host. Ownership is kept as one small
+    file per charge point and every worker listens on its own Unix socket,
+    speaking newline-delimited JSON.
+    """
+
+    def __init__(self, socket_dir: str):
+        self.socket_dir = socket_dir
+        self.owners_dir = os.path.join(socket_dir, "owners")
+        self._server = None
+        self._socket_path = None
+
+    def _owner_path(self, charge_point_id: str) -> str:
+        return os.path.join(self.owners_dir, quote(charge_point_id, safe=""))
+
+    def _worker_socket(self, worker_id: str) -> str:
+        return os.path.join(self.socket_dir, f"{quote(worker_id, safe='')}.sock")
+
+    async def start(self, worker_id: str, handler: EnvelopeHandler):
+        os.makedirs(self.owners_dir, exist_ok=True)
+        self._worker_id = worker_id
+        self._handler = handler
+        self._socket_path = self._worker_socket(worker_id)
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self._socket_path)
+        logger.info(f"Command router listening on {self._socket_path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._socket_path and os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            reply = await self._handler(json.loads(line))
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Error while serving forwarded command: {e}")
+        finally:
+            writer.close()
+
+    async def claim(self, charge_point_id: str, worker_id: str):
+        path = self._owner_path(charge_point_id)
+        tmp_path = f"{path}.{worker_id}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(worker_id)
+        os.replace(tmp_path, path)
+
+    async def release(self, charge_point_id: str, worker_id: str):
+        # Only drop the record if a newer connection on another worker has not taken it over
+        if await self.owner(charge_point_id) == worker_id:
+            try:
+                os.unlink(self._owner_path(charge_point_id))
+            except FileNotFoundError:
+                pass
+
+    async def owner(self, charge_point_id: str) -> Optional[str]:
+        try:
+            with open(self._owner_path(charge_point_id)) as f:
+                return f.read() or None
+        except FileNotFoundError:
+            return None
+
+    async def forward(self, worker_id: str, message: dict, timeout: float) -> dict:
+        try:
+            reader, writer = await asyncio.open_unix_connection(self._worker_socket(worker_id))
+        except (FileNotFoundError, ConnectionRefusedError):
+            # The owning worker is gone; its ownership record is stale
+            raise ChargePointNotConnected(message["charge_point_id"])
+        try:
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), timeout)
+        finally:
+            writer.close()
+        if not line:
+            raise CommandError("InternalError", f"Worker '{worker_id}' closed the connection")
+        return json.loads(line)
+
+
+class RedisTransport(CommandTransport):
+    """
+    Transport for workers spread over several nodes, backed by any server that
+    speaks the Redis protocol. Ownership lives in a hash; each worker has an
+    inbox channel for commands and a reply channel for results.
+    """
+
+    OWNERS_KEY = "ocpp:owners"
+    _RELEASE_SCRIPT = (
+        "if redis.call('hget', KEYS[1], ARGV[1]) == ARGV[2] then "
+        "return redis.call('hdel', KEYS[1], ARGV[1]) end return 0"
+    )
+
+    def __init__(self, url: str):
+        self.url = url
+        self._redis = None
+        self._pubsub = None
+        self._listener = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _inbox(worker_id: str) -> str:
+        return f"ocpp:worker:{worker_id}"
+
+    @staticmethod
+    def _replies(worker_id: str) -> str:
+        return f"ocpp:reply:{worker_id}"
+
+    async def start(self, worker_id: str, handler: EnvelopeHandler):
+        import redis.asyncio as aioredis  # Optional dependency, only needed for this backend
+
+        self._worker_id = worker_id
+        self._handler = handler
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self._inbox(worker_id), self._replies(worker_id))
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        if self._redis is not None:
+            await self._redis.close()
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    async def _listen(self):
+        async for item in self._pubsub.listen():
+            if item.get("type") != "message":
+                continue
+            # One bad message must not end the listener, or every forward to this worker times out
+            try:
+                self._dispatch(item["channel"], json.loads(item["data"]))
+            except Exception as e:
+                logger.error(f"Dropped malformed message on {item.get('channel')}: {e}")
+
+    def _dispatch(self, channel: str, data: dict):
+        if channel == self._inbox(self._worker_id):
+            asyncio.create_task(self._answer(data))
+        else:
+            future = self._pending.pop(data["request_id"], None)
+            if future is not None and not future.done():
+                future.set_result(data["reply"])
+
+    async def _answer(self, data: dict):
+        try:
+            reply = await self._handler(data["message"])
+            await self._redis.publish(
+                data["reply_to"], json.dumps({"request_id": data["request_id"], "reply": reply})
+            )
+        except Exception as e:
+            logger.error(f"Error while serving forwarded command: {e}")
+
+    async def claim(self, charge_point_id: str, worker_id: str):
+        await self._redis.hset(self.OWNERS_KEY, charge_point_id, worker_id)
+
+    async def release(self, charge_point_id: str, worker_id: str):
+        await self._redis.eval(self._RELEASE_SCRIPT, 1, self.OWNERS_KEY, charge_point_id, worker_id)
+
+    async def owner(self, charge_point_id: str) -> Optional[str]:
+        return await self._redis.hget(self.OWNERS_KEY, charge_point_id)
+
+    async def forward(self, worker_id: str, message: dict, timeout: float) -> dict:
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            receivers = await self._redis.publish(
+                self._inbox(worker_id),
+                json.dumps({
+                    "request_id": request_id,
+                    "reply_to": self._replies(self._worker_id),
+                    "message": message,
+                }),
+            )
+            if not receivers:
+                raise ChargePointNotConnected(message["charge_point_id"])
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+
+def create_transport(backend: str) -> CommandTransport:
+    """
+    Build the command transport configured for this deployment.
+    """
+    if backend == "memory":
+        return InMemoryTransport()
+    if backend == "unix":
+        return UnixSocketTransport(settings.OCPP_ROUTER_SOCKET_DIR)
+    if backend == "redis":
+        return RedisTransport(settings.REDIS_URL)
+    raise ValueError(f"Unknown OCPP router backend: {backend}")
+
+
+class CommandRouter:
+    """
+    Delivers commands to charge points regardless of which worker holds their
+    WebSocket. Local connections are called directly; everything else is
+    forwarded to the owning worker through the transport.
+    """
+
+    FORWARD_GRACE = 2.0
+
+    def __init__(self, transport: CommandTransport, worker_id: Optional[str] = None):
+        self.transport = transport
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._local: Dict[str, CommandHandler] = {}
+
+    async def start(self):
+        await self.transport.start(self.worker_id, self._handle_forwarded)
+        logger.info(f"Command router started for worker {self.worker_id}")
+
+    async def stop(self):
+        for charge_point_id in list(self._local):
+            await self.transport.release(charge_point_id, self.worker_id)
+        self._local.clear()
+        await self.transport.stop()
+
+    async def attach(self, charge_point_id: str, handler: CommandHandler):
+        """
+        Register a charge point connected to this worker.
+        """
+        self._local[charge_point_id] = handler
+        await self.transport.claim(charge_point_id, self.worker_id)
+
+    async def detach(self, charge_point_id: str, handler: CommandHandler):
+        """
+        Forget a charge point connection, unless a reconnect already replaced it.
+        """
+        if self._local.get(charge_point_id) == handler:
+            del self._local[charge_point_id]
+            await self.transport.release(charge_point_id, self.worker_id)
+
+    def is_local(self, charge_point_id: str) -> bool:
+        return charge_point_id in self._local
+
+    async def send(self, charge_point_id: str, action: str, payload: dict, timeout: Optional[float] = None) -> dict:
+        """
+        Send a command to a charge point and return its result payload.
+        """
+        timeout = timeout or settings.OCPP_COMMAND_TIMEOUT
+        handler = self._local.get(charge_point_id)
+        if handler is not None:
+            return await handler(action, payload, timeout)
+
+        owner = await self.transport.owner(charge_point_id)
+        if owner is None or owner == self.worker_id:
+            raise ChargePointNotConnected(charge_point_id)
+
+        message = {"charge_point_id": charge_point_id, "action": action, "payload": payload, "timeout": timeout}
+        try:
+            # Leave the owner time to report its own timeout before giving up on it
+            reply = await self.transport.forward(owner, message, timeout + self.FORWARD_GRACE)
+        except asyncio.TimeoutError:
+            raise CommandError("Timeout", f"Worker '{owner}' did not answer in time")
+        if not reply.get("ok"):
+            if reply.get("error") == "NotConnected":
+                raise ChargePointNotConnected(charge_point_id)
+            raise CommandError(reply.get("error", "InternalError"), reply.get("description", ""))
+        return reply["result"]
+
+    async def broadcast(
+            self, charge_point_ids: List[str], action: str, payload: dict, timeout: Optional[float] = None
+    ) -> Dict[str, Union[dict, CommandError]]:
+        """
+        Send the same command to many charge points concurrently.
+        Returns each charge point's result payload, or the CommandError it failed with.
+        """
+        results = await asyncio.gather(
+            *(self.send(charge_point_id, action, payload, timeout) for charge_point_id in charge_point_ids),
+            return_exceptions=True,
+        )
+        outcome = {}
+        for charge_point_id, result in zip(charge_point_ids, results):
+            if isinstance(result, Exception) and not isinstance(result, CommandError):
+                result = CommandError("InternalError", str(result))
+            outcome[charge_point_id] = result
+        return outcome
+
+    async def _handle_forwarded(self, message: dict) -> dict:
+        charge_point_id = message.get("charge_point_id")
+        handler = self._local.get(charge_point_id)
+        if handler is None:
+            return {"ok": False, "error": "NotConnected"}
+        try:
+            result = await handler(
+                message["action"], message.get("payload", {}), message.get("timeout", settings.OCPP_COMMAND_TIMEOUT)
+            )
+            return {"ok": True, "result": result}
+        except CommandError as e:
+            return {"ok": False, "error": e.code, "description": e.description}
+        except Exception as e:
+            logger.error(f"Forwarded command for {charge_point_id} failed: {e}")
+            return {"ok": False, "error": "InternalError", "description": str(e)}
+
+
+command_router = CommandRouter(create_transport(settings.OCPP_ROUTER_BACKEND), settings.WORKER_ID or None)
@@ -15,7 +15,8 @@ class ChargingSessionBase(BaseModel):
 
 
 class ChargingSessionCreate(ChargingSessionBase):
-    pass
+    charger_id: Optional[int] = None  # None picks the first free charger
+    start_time: Optional[datetime] = None
 
 
 class ChargingSessionUpdate(BaseModel):
@@ -32,9 +33,23 @@ class ChargingSession(ChargingSessionBase):
         orm_mode = True
 
 
+class SessionReport(BaseModel):
+    total_sessions: int
+    total_energy: float
+    total_cost: float
+    sessions: List[ChargingSession] = []
+
+
+class ArchiveResult(BaseModel):
+    archived: int
+    older_than_days: int
+
+
 class StationBase(BaseModel):
     name: str
     location: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     power_output: float
     ocpp_id: str
     status: str = "Available"
@@ -50,14 +65,90 @@ class StationCreate(StationBase):
 class StationUpdate(BaseModel):
     name: Optional[str]
     location: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
     power_output: Optional[float]
     status: Optional[str]
     num_chargers: Optional[int]
 
 
+class StationSummary(BaseModel):
+    id: int
+    name: str
+    location: str
+    status: str
+
+    class Config:
+        orm_mode = True
+
+
+class NearbyStation(BaseModel):
+    id: int
+    name: str
+    location: str
+    latitude: float
+    longitude: float
+    status: str
+    num_chargers: int
+    free_chargers: int
+    distance_km: float
+
+
 class Station(StationBase):
     id: int
     sessions: Optional[List[ChargingSession]] = []  # Nested list of sessions
 
     class Config:
         orm_mode = True
+
+
+class ChargerCommand(BaseModel):
+    action: str
+    payload: dict = {}
+
+
+class CommandResult(BaseModel):
+    charge_point_id: str
+    action: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class RemoteStartRequest(BaseModel):
+    id_tag: str
+    connector_id: Optional[int] = None
+
+
+class RemoteStopRequest(BaseModel):
+    transaction_id: int
+
+
+class ChangeAvailabilityRequest(BaseModel):
+    connector_id: int = 0  # 0 addresses the whole charge point
+    type: str = "Operative"  # Operative or Inoperative
+
+
+class BulkChangeAvailabilityRequest(ChangeAvailabilityRequest):
+    station_ids: Optional[List[int]] = None  # None targets every station
+
+
+class StationReport(BaseModel):
+    station_id: int
+    total_sessions: int
+    total_energy: float
+    total_revenue: float
+    sessions: List[ChargingSession] = []
+
+
+class UtilizationReport(BaseModel):
+    station_id: Optional[int] = None  # None for the fleet-wide report
+    start: datetime
+    end: datetime
+    bin_minutes: int
+    num_chargers: int
+    bins: List[datetime]  # Start of each bin
+    mean_occupancy: List[float]  # Average concurrent sessions per bin
+    peak_occupancy: List[int]  # Maximum concurrent sessions per bin
+    peak_concurrency: int
+    utilization: float  # Mean concurrent sessions divided by num_chargers
+    busy_hours: List[List[float]]  # 7 x 24 mean occupancy, Monday first, UTC hours
@@ -0,0 +1,188 @@
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Set
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app import models
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# External-content FTS5 table over stations, kept in sync by triggers
+FTS_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE stations_fts USING fts5("
+    "name, location, content='stations', content_rowid='id')"
+)
+FTS_TRIGGERS_SQL = [
+    """CREATE TRIGGER IF NOT EXISTS stations_fts_ai AFTER INSERT ON stations BEGIN
+        INSERT INTO stations_fts(rowid, name, location) VALUES (new.id, new.name, new.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stations_fts_ad AFTER DELETE ON stations BEGIN
+        INSERT INTO stations_fts(stations_fts, rowid, name, location)
+        VALUES ('delete', old.id, old.name, old.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stations_fts_au AFTER UPDATE OF name, location ON stations BEGIN
+        INSERT INTO stations_fts(stations_fts, rowid, name, location)
+        VALUES ('delete', old.id, old.name, old.location);
+        INSERT INTO stations_fts(rowid, name, location) VALUES (new.id, new.name, new.location);
+    END""",
+]
+
+
+def tokenize(value: str) -> List[str]:
+    # Accents are dropped like FTS5's unicode61 tokenizer does, so "munch" finds "München"
+    folded = "".join(char for char in unicodedata.normalize("NFKD", value or "") if not unicodedata.combining(char))
+    return [token.lower() for token in _TOKEN_RE.findall(folded)]
+
+
+class PrefixIndex:
+    """
+    In-memory token prefix index for databases without FTS5.
+    Tokens are kept sorted, so the tokens starting with a prefix form one
+    contiguous range found with two binary searches. Like the nearby index it
+    is per worker, so refresh_if_stale reloads it to pick up other workers' changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens: List[str] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._documents: Dict[int, Set[str]] = {}
+        self._built_at = float("-inf")
+
+    def rebuild(self, db: Session):
+        with self._lock:
+            self._tokens = []
+            self._postings = {}
+            self._documents = {}
+            for station_id, name, location in db.query(models.Station.id, models.Station.name, models.Station.location):
+                self._add(station_id, f"{name} {location}")
+            self._built_at = time.monotonic()
+
+    def refresh_if_stale(self, db: Session, max_age: float):
+        """
+        Rebuild from the database once the index is older than max_age seconds (0 disables).
+        """
+        if max_age <= 0:
+            return
+        with self._lock:
+            if time.monotonic() - self._built_at <= max_age:
+                return
+            # Claimed up front so concurrent requests do not all rebuild
+            self._built_at = time.monotonic()
+        self.rebuild(db)
+
+    def _add(self, station_id: int, value: str):
+        tokens = set(tokenize(value))
+        self._documents[station_id] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                bisect.insort(self._tokens, token)
+            self._postings[token].add(station_id)
+
+    def _remove(self, station_id: int):
+        for token in self._documents.pop(station_id, ()):
+            postings = self._postings[token]
+            postings.discard(station_id)
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def upsert(self, station_id: int, name: str, location: str):
+        with self._lock:
+            self._remove(station_id)
+            self._add(station_id, f"{name} {location}")
+
+    def remove(self, station_id: int):
+        with self._lock:
+            self._remove(station_id)
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """
+        Return ids of stations having, for every query term, a token starting with it.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        matches = None
+        with self._lock:
+            for term in terms:
+                start = bisect.bisect_left(self._tokens, term)
+                end = bisect.bisect_left(self._tokens, term + "\uffff")
+                ids = set()
+                for token in self._tokens[start:end]:
+                    ids |= self._postings[token]
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+        return sorted(matches)[:limit]
+
+
+class StationSearch:
+    """
+    Prefix search over station name and location. Uses an FTS5 table on
+    SQLite and the in-memory PrefixIndex everywhere else.
+    """
+
+    def __init__(self):
+        self.use_fts = False
+        self.fallback = PrefixIndex()
+
+    def setup(self, engine: Engine, db: Session):
+        """
+        Create the FTS5 table and triggers if needed, or load the fallback index.
+        """
+        self.use_fts = False
+        if engine.dialect.name == "sqlite":
+            try:
+                with engine.begin() as connection:
+                    exists = connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stations_fts'")
+                    ).first()
+                    if not exists:
+                        connection.execute(text(FTS_TABLE_SQL))
+                        connection.execute(text("INSERT INTO stations_fts(stations_fts) VALUES ('rebuild')"))
+                    for trigger in FTS_TRIGGERS_SQL:
+                        connection.execute(text(trigger))
+                self.use_fts = True
+            except Exception as e:
+                logger.warning(f"FTS5 unavailable, using in-memory search index: {e}")
+        if not self.use_fts:
+            self.fallback.rebuild(db)
+
+    def index(self, station: models.Station):
+        # FTS5 triggers keep the SQLite index in sync
+        if not self.use_fts:
+            self.fallback.upsert(station.id, station.name, station.location)
+
+    def remove(self, station_id: int):
+        if not self.use_fts:
+            self.fallback.remove(station_id)
+
+    def search(self, db: Session, query: str, limit: int = 10, max_age: float = 0) -> List[int]:
+        """
+        Return ids of stations matching every term as a prefix, best matches first.
+        The fallback index is reloaded first if it is older than max_age seconds.
+        """
+        if not self.use_fts:
+            self.fallback.refresh_if_stale(db, max_age)
+            return self.fallback.search(query, limit)
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        rows = db.execute(
+            text("SELECT rowid FROM stations_fts WHERE stations_fts MATCH :match ORDER BY rank LIMIT :limit"),
+            {"match": match, "limit": limit},
+        )
+        return [row[0] for row in rows]
+
+
+station_search = StationSearch()
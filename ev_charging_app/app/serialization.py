@@ -0,0 +1,65 @@
+import json
+from datetime import date, datetime
+from typing import Dict, List
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import models, schemas
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # Optional dependency; the standard library encoder is used instead
+    orjson = None
+
+# Field order of the response schemas, so the JSON matches what response_model produces
+SESSION_FIELDS = list(schemas.ChargingSession.__fields__)
+STATION_FIELDS = [name for name in schemas.Station.__fields__ if name != "sessions"]
+
+
+def enabled(endpoint: str) -> bool:
+    """
+    Whether the fast path is switched on for the named endpoint.
+    """
+    return endpoint in settings.FAST_JSON_ENDPOINTS
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(content) -> Response:
+    return Response(content=dumps(content), media_type="application/json")
+
+
+def session_rows(db: Session, *criteria) -> List[dict]:
+    """
+    Select charging sessions as plain column tuples, without building ORM objects.
+    """
+    columns = [getattr(models.ChargingSession, name) for name in SESSION_FIELDS]
+    query = select(*columns).where(*criteria).order_by(models.ChargingSession.id)
+    return [dict(zip(SESSION_FIELDS, row)) for row in db.execute(query)]
+
+
+def station_rows(db: Session, skip: int, limit: int) -> List[dict]:
+    """
+    Select a page of stations with their nested sessions using two column queries.
+    """
+    columns = [getattr(models.Station, name) for name in STATION_FIELDS]
+    query = select(*columns).order_by(models.Station.id).offset(skip).limit(limit)
+    stations = [dict(zip(STATION_FIELDS, row), sessions=[]) for row in db.execute(query)]
+    if not stations:
+        return stations
+
+    by_id: Dict[int, dict] = {station["id"]: station for station in stations}
+    for session in session_rows(db, models.ChargingSession.station_id.in_(list(by_id))):
+        by_id[session["station_id"]]["sessions"].append(session)
+    return stations
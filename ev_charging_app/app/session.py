@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-from app import models, schemas, dependencies
+from app import models, schemas, dependencies, serialization
+from app.config import settings
+from app.availability import charger_availability
 from typing import List
 
 router = APIRouter()
@@ -18,22 +21,52 @@ def start_charging_session(
     station = db.query(models.Station).filter(models.Station.id == session.station_id).first()
     if not station:
         raise HTTPException(status_code=404, detail="Charging station not found")
-    if not station.is_active:
-        raise HTTPException(status_code=400, detail="Charging station is inactive")
-
-    # Create and save session
-    db_session = models.ChargingSession(
-        user_id=session.user_id,
-        station_id=session.station_id,
-        start_time=datetime.utcnow(),
-        energy_used=0.0,
-        cost=0.0,
-        status="InProgress",
-    )
-    db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return db_session
+    if station.status == "Offline":
+        raise HTTPException(status_code=400, detail="Charging station is offline")
+    num_chargers = station.num_chargers or 1
+    if session.charger_id is not None and not 1 <= session.charger_id <= num_chargers:
+        raise HTTPException(status_code=400, detail="Charger does not exist at this station")
+
+    # Reserve a charger in memory first, then let the unique index on active
+    # (station_id, charger_id) settle races with other workers
+    resynced = False
+    for _ in range(num_chargers + 2):
+        charger_id = charger_availability.reserve(station.id, num_chargers, session.charger_id)
+        if charger_id is None:
+            if resynced:
+                break
+            # Our bitmap may be stale if another worker ended a session
+            charger_availability.refresh_station(db, station.id, num_chargers)
+            resynced = True
+            continue
+
+        # Create and save session
+        db_session = models.ChargingSession(
+            user_id=session.user_id,
+            station_id=session.station_id,
+            charger_id=charger_id,
+            start_time=datetime.utcnow(),
+            energy_used=0.0,
+            cost=0.0,
+            is_active=True,
+        )
+        db.add(db_session)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Booked concurrently elsewhere; the bit stays set and we try the next charger
+            db.rollback()
+            continue
+        except Exception:
+            # Nothing was booked (e.g. "database is locked"), so free the charger again
+            db.rollback()
+            charger_availability.release(station.id, charger_id)
+            raise
+        db.refresh(db_session)
+        return db_session
+
+    detail = "Charger is already in use" if session.charger_id is not None else "No free charger at this station"
+    raise HTTPException(status_code=409, detail=detail)
 
 
 @router.put("/sessions/{session_id}/end", response_model=schemas.ChargingSession)
@@ -56,11 +89,12 @@ def end_charging_session(session_id: int, db: Session = Depends(dependencies.get
         raise HTTPException(status_code=404, detail="Station details not found")
 
     db_session.energy_used = round(station.power_output * duration, 2)  # e.g., kWh
-    db_session.cost = round(db_session.energy_used * station.rate_per_kwh, 2)  # e.g., $
+    db_session.cost = round(db_session.calculate_cost(settings.RATE_PER_KWH), 2)  # e.g., $
 
-    # Update session status
-    db_session.status = "Completed"
+    # Update session status and free the charger
+    db_session.is_active = False
     db.commit()
+    charger_availability.release(db_session.station_id, db_session.charger_id)
     db.refresh(db_session)
     return db_session
 
@@ -81,6 +115,11 @@ def get_user_sessions(user_id: int, db: Session = Depends(dependencies.get_db)):
     """
     Retrieve all charging sessions for a specific user.
     """
+    if serialization.enabled("get_user_sessions"):
+        rows = serialization.session_rows(db, models.ChargingSession.user_id == user_id)
+        if not rows:
+            raise HTTPException(status_code=404, detail="No sessions found for this user")
+        return serialization.json_response(rows)
     user_sessions = db.query(models.ChargingSession).filter(models.ChargingSession.user_id == user_id).all()
     if not user_sessions:
         raise HTTPException(status_code=404, detail="No sessions found for this user")
@@ -92,6 +131,11 @@ def get_station_sessions(station_id: int, db: Session = Depends(dependencies.get
     """
     Retrieve all charging sessions for a specific station.
     """
+    if serialization.enabled("get_station_sessions"):
+        rows = serialization.session_rows(db, models.ChargingSession.station_id == station_id)
+        if not rows:
+            raise HTTPException(status_code=404, detail="No sessions found for this station")
+        return serialization.json_response(rows)
     station_sessions = db.query(models.ChargingSession).filter(models.ChargingSession.station_id == station_id).all()
     if not station_sessions:
         raise HTTPException(status_code=404, detail="No sessions found for this station")
@@ -103,6 +147,8 @@ def get_all_sessions(db: Session = Depends(dependencies.get_db)):
     """
     Retrieve all charging sessions (admin view).
     """
+    if serialization.enabled("get_all_sessions"):
+        return serialization.json_response(serialization.session_rows(db))
     all_sessions = db.query(models.ChargingSession).all()
     return all_sessions
 
@@ -118,8 +164,9 @@ def cancel_charging_session(session_id: int, db: Session = Depends(dependencies.
 
     # Mark the session as canceled
     db_session.end_time = datetime.utcnow()
-    db_session.status = "Canceled"
+    db_session.is_active = False
     db.commit()
+    charger_availability.release(db_session.station_id, db_session.charger_id)
     db.refresh(db_session)
     return db_session
 
@@ -144,12 +191,32 @@ def generate_session_report(
 
     sessions = query.all()
 
-    total_energy = sum(session.energy_used for session in sessions)
-    total_cost = sum(session.cost for session in sessions)
+    # Completed sessions moved to the cold archive are scanned from disk;
+    # the archive module (and numpy) is only loaded once a report needs it
+    from app import archive
+    archived = archive.scan_archive(
+        station_id=station_id or None,
+        user_id=user_id or None,
+        start_time_from=start_date,
+        start_time_to=end_date,
+    )
+
+    total_energy = sum(session.energy_used for session in sessions) + float(archived["energy_used"].sum())
+    total_cost = sum(session.cost for session in sessions) + float(archived["cost"].sum())
 
     return schemas.SessionReport(
-        total_sessions=len(sessions),
+        total_sessions=len(sessions) + len(archived["id"]),
         total_energy=total_energy,
         total_cost=total_cost,
-        sessions=sessions,
+        sessions=sessions + archive.archive_records(archived),
     )
+
+
+@router.post("/sessions/archive/", response_model=schemas.ArchiveResult)
+def archive_sessions(older_than_days: int = None, db: Session = Depends(dependencies.get_db)):
+    """
+    Move sessions that ended more than older_than_days ago into the cold archive.
+    """
+    from app import archive
+    days = older_than_days if older_than_days is not None else settings.ARCHIVE_AFTER_DAYS
+    return schemas.ArchiveResult(archived=archive.archive_completed_sessions(db, days), older_than_days=days)
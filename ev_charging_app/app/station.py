@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from app import models, schemas, dependencies
-from typing import List
+from app import models, schemas, dependencies, serialization
+from app.config import settings
+from app.availability import charger_availability
+from app.geo import station_locations
+from app.search import station_search
+from app.routing import command_router, CommandError, ChargePointNotConnected
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -16,6 +24,9 @@ def create_station(station: schemas.StationCreate, db: Session = Depends(depende
         db.add(db_station)
         db.commit()
         db.refresh(db_station)
+        charger_availability.set_capacity(db_station.id, db_station.num_chargers)
+        station_locations.upsert(db_station.id, db_station.latitude, db_station.longitude)
+        station_search.index(db_station)
         return db_station
     except IntegrityError:
         raise HTTPException(
@@ -23,6 +34,154 @@ def create_station(station: schemas.StationCreate, db: Session = Depends(depende
         )
 
 
+@router.get("/search", response_model=List[schemas.StationSummary])
+def search_stations(
+        q: str = Query(..., min_length=1, max_length=100),
+        limit: int = Query(10, gt=0, le=50),
+        db: Session = Depends(dependencies.get_db),
+):
+    """
+    Prefix search on station name and location, for autocomplete.
+    """
+    station_ids = station_search.search(db, q, limit, settings.SEARCH_INDEX_MAX_AGE)
+    if not station_ids:
+        return []
+    stations = {
+        station.id: station
+        for station in db.query(models.Station).filter(models.Station.id.in_(station_ids))
+    }
+    return [stations[station_id] for station_id in station_ids if station_id in stations]
+
+
+def _utilization_report(
+        db: Session, station_id: Optional[int], num_chargers: int, start: Optional[datetime],
+        end: Optional[datetime], bin_minutes: int,
+) -> schemas.UtilizationReport:
+    """
+    Compute (or fetch from cache) the occupancy curve for one station or the whole fleet.
+    """
+    # numpy is only loaded once an analytics endpoint is used
+    from app import analytics
+
+    # Session times are stored as naive UTC
+    if start and start.tzinfo:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and end.tzinfo:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    end = end or datetime.utcnow().replace(second=0, microsecond=0)
+    start = start or end - timedelta(days=7)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    bin_seconds = bin_minutes * 60
+    if (end - start).total_seconds() / bin_seconds > settings.UTILIZATION_MAX_BINS:
+        raise HTTPException(status_code=400, detail="Too many bins; use a larger bin_minutes")
+
+    key = (station_id, start, end, bin_minutes)
+    report = analytics.utilization_cache.get(key)
+    if report is not None:
+        return report
+
+    starts, ends = analytics.session_intervals(db, station_id, start, end)
+    range_start, range_end = analytics.to_seconds([start, end])
+    curve = analytics.occupancy_curve(starts, ends, int(range_start), int(range_end), bin_seconds)
+
+    report = schemas.UtilizationReport(
+        station_id=station_id,
+        start=start,
+        end=end,
+        bin_minutes=bin_minutes,
+        num_chargers=num_chargers,
+        bins=curve["bin_starts"].astype("datetime64[s]").tolist(),
+        mean_occupancy=curve["mean_occupancy"].round(4).tolist(),
+        peak_occupancy=curve["peak_occupancy"].tolist(),
+        peak_concurrency=curve["peak_concurrency"],
+        utilization=round(curve["mean_concurrency"] / num_chargers, 4) if num_chargers else 0.0,
+        busy_hours=curve["busy_hours"].round(4).tolist(),
+    )
+    analytics.utilization_cache.put(key, report)
+    return report
+
+
+@router.get("/utilization", response_model=schemas.UtilizationReport)
+def get_fleet_utilization(
+        start: datetime = None,
+        end: datetime = None,
+        bin_minutes: int = Query(60, gt=0),
+        db: Session = Depends(dependencies.get_db),
+):
+    """
+    Concurrent sessions over time across all stations, with peak concurrency and busy hours.
+    """
+    num_chargers = db.query(func.sum(models.Station.num_chargers)).scalar() or 0
+    return _utilization_report(db, None, num_chargers, start, end, bin_minutes)
+
+
+@router.get("/nearby", response_model=List[schemas.NearbyStation])
+def find_nearby_stations(
+        lat: float = Query(..., ge=-90, le=90),
+        lon: float = Query(..., ge=-180, le=180),
+        radius: float = Query(5.0, gt=0, le=200, description="Search radius in km"),
+        available: bool = False,
+        limit: int = Query(20, gt=0, le=100),
+        db: Session = Depends(dependencies.get_db),
+):
+    """
+    Find stations within a radius of a point, nearest first.
+    With available=true only stations that have a free charger are returned.
+    """
+    # Stations created or moved through other workers are picked up on refresh
+    station_locations.refresh_if_stale(db, settings.GEO_INDEX_MAX_AGE)
+    # Over-fetch when filtering, and widen until the page is full or the radius is exhausted
+    fetch = limit * 2 if available else limit
+    while True:
+        candidates = station_locations.nearby(lat, lon, radius, fetch)
+        results = _nearby_results(db, candidates, available, limit)
+        if len(results) == limit or len(candidates) < fetch:
+            return results
+        fetch *= 4
+
+
+def _nearby_results(db: Session, candidates, available: bool, limit: int) -> List[schemas.NearbyStation]:
+    station_ids = [station_id for station_id, _ in candidates]
+    stations = {
+        station.id: station
+        for station in db.query(models.Station).filter(models.Station.id.in_(station_ids))
+    }
+    # Free chargers come from the database (covered by the partial index on active
+    # sessions), since sessions are also started and ended through other workers
+    active = dict(
+        db.query(models.ChargingSession.station_id, func.count(models.ChargingSession.id))
+        .filter(
+            models.ChargingSession.station_id.in_(station_ids),
+            models.ChargingSession.is_active == True,  # noqa: E712
+        )
+        .group_by(models.ChargingSession.station_id)
+    )
+
+    results = []
+    for station_id, distance in candidates:
+        station = stations.get(station_id)
+        if station is None:
+            continue
+        free_chargers = max(0, (station.num_chargers or 1) - active.get(station_id, 0))
+        if available and (station.status == "Offline" or not free_chargers):
+            continue
+        results.append(schemas.NearbyStation(
+            id=station.id,
+            name=station.name,
+            location=station.location,
+            latitude=station.latitude,
+            longitude=station.longitude,
+            status=station.status,
+            num_chargers=station.num_chargers,
+            free_chargers=free_chargers,
+            distance_km=round(distance, 3),
+        ))
+        if len(results) == limit:
+            break
+    return results
+
+
 @router.get("/{station_id}", response_model=schemas.Station)
 def get_station(station_id: int, db: Session = Depends(dependencies.get_db)):
     """
@@ -39,6 +198,11 @@ def list_stations(skip: int = 0, limit: int = 10, db: Session = Depends(dependen
     """
     Retrieve a paginated list of all charging stations.
     """
+    if serialization.enabled("list_stations"):
+        rows = serialization.station_rows(db, skip, limit)
+        if not rows:
+            raise HTTPException(status_code=404, detail="No stations available")
+        return serialization.json_response(rows)
     stations = db.query(models.Station).offset(skip).limit(limit).all()
     if not stations:
         raise HTTPException(status_code=404, detail="No stations available")
@@ -57,6 +221,9 @@ def update_station(station_id: int, station: schemas.StationUpdate, db: Session
         setattr(db_station, key, value)
     db.commit()
     db.refresh(db_station)
+    charger_availability.set_capacity(db_station.id, db_station.num_chargers)
+    station_locations.upsert(db_station.id, db_station.latitude, db_station.longitude)
+    station_search.index(db_station)
     return db_station
 
 
@@ -70,6 +237,9 @@ def delete_station(station_id: int, db: Session = Depends(dependencies.get_db)):
         raise HTTPException(status_code=404, detail="Station not found")
     db.delete(db_station)
     db.commit()
+    charger_availability.forget(station_id)
+    station_locations.remove(station_id)
+    station_search.remove(station_id)
 
 
 @router.put("/{station_id}/activate", response_model=schemas.Station)
@@ -109,17 +279,39 @@ def get_station_sessions(station_id: int, db: Session = Depends(dependencies.get
     """
     Retrieve all charging sessions associated with a specific station.
     """
+    if serialization.enabled("get_station_sessions"):
+        rows = serialization.session_rows(db, models.ChargingSession.station_id == station_id)
+        if not rows:
+            raise HTTPException(status_code=404, detail="No sessions found for this station")
+        return serialization.json_response(rows)
     sessions = db.query(models.ChargingSession).filter(models.ChargingSession.station_id == station_id).all()
     if not sessions:
         raise HTTPException(status_code=404, detail="No sessions found for this station")
     return sessions
 
 
+@router.get("/{station_id}/utilization", response_model=schemas.UtilizationReport)
+def get_station_utilization(
+        station_id: int,
+        start: datetime = None,
+        end: datetime = None,
+        bin_minutes: int = Query(60, gt=0),
+        db: Session = Depends(dependencies.get_db),
+):
+    """
+    Concurrent sessions over time at a station, with peak concurrency and busy hours.
+    """
+    db_station = db.query(models.Station).filter(models.Station.id == station_id).first()
+    if not db_station:
+        raise HTTPException(status_code=404, detail="Station not found")
+    return _utilization_report(db, station_id, db_station.num_chargers or 1, start, end, bin_minutes)
+
+
 @router.get("/{station_id}/report", response_model=schemas.StationReport)
 def generate_station_report(
         station_id: int,
-        start_date: str = None,
-        end_date: str = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
         db: Session = Depends(dependencies.get_db),
 ):
     """
@@ -129,6 +321,12 @@ def generate_station_report(
     if not db_station:
         raise HTTPException(status_code=404, detail="Station not found")
 
+    # Stored timestamps are naive UTC
+    if start_date and start_date.tzinfo:
+        start_date = start_date.astimezone(timezone.utc).replace(tzinfo=None)
+    if end_date and end_date.tzinfo:
+        end_date = end_date.astimezone(timezone.utc).replace(tzinfo=None)
+
     query = db.query(models.ChargingSession).filter(models.ChargingSession.station_id == station_id)
 
     if start_date:
@@ -137,13 +335,117 @@ def generate_station_report(
         query = query.filter(models.ChargingSession.end_time <= end_date)
 
     sessions = query.all()
-    total_energy = sum(session.energy_used for session in sessions)
-    total_revenue = sum(session.cost for session in sessions)
+
+    # Completed sessions moved to the cold archive are scanned from disk;
+    # the archive module (and numpy) is only loaded once a report needs it
+    from app import archive
+    archived = archive.scan_archive(
+        station_id=station_id,
+        start_time_from=start_date,
+        end_time_to=end_date,
+    )
+
+    total_energy = sum(session.energy_used for session in sessions) + float(archived["energy_used"].sum())
+    total_revenue = sum(session.cost for session in sessions) + float(archived["cost"].sum())
 
     return schemas.StationReport(
         station_id=station_id,
-        total_sessions=len(sessions),
+        total_sessions=len(sessions) + len(archived["id"]),
         total_energy=total_energy,
         total_revenue=total_revenue,
-        sessions=sessions,
+        sessions=sessions + archive.archive_records(archived),
     )
+
+
+def _charge_point_id(db: Session, station_id: int) -> str:
+    db_station = db.query(models.Station).filter(models.Station.id == station_id).first()
+    if not db_station:
+        raise HTTPException(status_code=404, detail="Station not found")
+    return db_station.ocpp_id
+
+
+def _charge_point_ids(db: Session, station_ids: Optional[List[int]]) -> List[str]:
+    query = db.query(models.Station.ocpp_id)
+    if station_ids is not None:
+        query = query.filter(models.Station.id.in_(station_ids))
+    return [row.ocpp_id for row in query.all()]
+
+
+async def _send_to_station(station_id: int, action: str, payload: dict, db: Session) -> schemas.CommandResult:
+    """
+    Look up the station's charge point and await the result of one OCPP CALL.
+    """
+    # Queries run in the threadpool so they never block the OCPP connections on the event loop
+    charge_point_id = await run_in_threadpool(_charge_point_id, db, station_id)
+    try:
+        result = await command_router.send(charge_point_id, action, payload)
+    except ChargePointNotConnected as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.description)
+    except CommandError as e:
+        code = status.HTTP_504_GATEWAY_TIMEOUT if e.code == "Timeout" else status.HTTP_502_BAD_GATEWAY
+        raise HTTPException(status_code=code, detail=str(e))
+    return schemas.CommandResult(charge_point_id=charge_point_id, action=action, result=result)
+
+
+@router.post("/{station_id}/commands", response_model=schemas.CommandResult)
+async def send_station_command(
+        station_id: int, command: schemas.ChargerCommand, db: Session = Depends(dependencies.get_db)
+):
+    """
+    Send a command to the station's charge point, whichever worker holds its connection.
+    """
+    return await _send_to_station(station_id, command.action, command.payload, db)
+
+
+@router.post("/{station_id}/remote-start", response_model=schemas.CommandResult)
+async def remote_start_transaction(
+        station_id: int, request: schemas.RemoteStartRequest, db: Session = Depends(dependencies.get_db)
+):
+    """
+    Ask the station's charge point to start a transaction (RemoteStartTransaction).
+    """
+    payload = {"idTag": request.id_tag}
+    if request.connector_id is not None:
+        payload["connectorId"] = request.connector_id
+    return await _send_to_station(station_id, "RemoteStartTransaction", payload, db)
+
+
+@router.post("/{station_id}/remote-stop", response_model=schemas.CommandResult)
+async def remote_stop_transaction(
+        station_id: int, request: schemas.RemoteStopRequest, db: Session = Depends(dependencies.get_db)
+):
+    """
+    Ask the station's charge point to stop a transaction (RemoteStopTransaction).
+    """
+    payload = {"transactionId": request.transaction_id}
+    return await _send_to_station(station_id, "RemoteStopTransaction", payload, db)
+
+
+@router.post("/{station_id}/availability", response_model=schemas.CommandResult)
+async def change_availability(
+        station_id: int, request: schemas.ChangeAvailabilityRequest, db: Session = Depends(dependencies.get_db)
+):
+    """
+    Change the availability of a station's charge point or one of its connectors.
+    """
+    payload = {"connectorId": request.connector_id, "type": request.type}
+    return await _send_to_station(station_id, "ChangeAvailability", payload, db)
+
+
+@router.post("/availability", response_model=List[schemas.CommandResult])
+async def change_availability_bulk(
+        request: schemas.BulkChangeAvailabilityRequest, db: Session = Depends(dependencies.get_db)
+):
+    """
+    Send ChangeAvailability to many charge points at once; the calls run concurrently.
+    """
+    charge_point_ids = await run_in_threadpool(_charge_point_ids, db, request.station_ids)
+
+    payload = {"connectorId": request.connector_id, "type": request.type}
+    outcome = await command_router.broadcast(charge_point_ids, "ChangeAvailability", payload)
+    return [
+        schemas.CommandResult(charge_point_id=charge_point_id, action="ChangeAvailability", error=str(result))
+        if isinstance(result, CommandError)
+        else schemas.CommandResult(charge_point_id=charge_point_id, action="ChangeAvailability", result=result)
+        for charge_point_id, result in outcome.items()
+    ]
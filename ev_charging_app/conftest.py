@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app import dependencies, main
+from app.availability import charger_availability
+from app.config import settings
+from app.database import Base
+from app.geo import station_locations
+from app.main import app
+from app.ratelimit import TokenBucketLimiter
+from app.search import station_search
+
+
+@pytest.fixture
+def db_factory():
+    """
+    A fresh in-memory database with the model tables, shared by every connection.
+    """
+    from app import models  # noqa: F401 - registers the model tables on Base
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def client(db_factory, monkeypatch):
+    """
+    A TestClient whose requests use the in-memory database. Startup events are
+    not run, so the on-disk database is never touched. Every test gets its own
+    admission bucket, since all requests come from the same client address.
+    """
+    def get_db():
+        db = db_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    db = db_factory()
+    try:
+        charger_availability.rebuild(db)
+        station_locations.rebuild(db)
+        station_search.setup(db_factory.kw["bind"], db)
+    finally:
+        db.close()
+    monkeypatch.setattr(main, "api_limiter", TokenBucketLimiter(
+        settings.RATE_LIMIT_API_RATE, settings.RATE_LIMIT_API_BURST, settings.RATE_LIMIT_MAX_KEYS
+    ))
+    app.dependency_overrides[dependencies.get_db] = get_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
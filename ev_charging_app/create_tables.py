@@ -1,4 +1,4 @@
 # This will create all the tables defined in the models
-from app import models, database
+from app import database
 
-models.Base.metadata.create_all(bind=database.engine)
+database.init_database()
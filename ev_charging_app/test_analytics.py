@@ -0,0 +1,74 @@
+import numpy as np
+from datetime import datetime
+from app import analytics, archive
+from app.analytics import occupancy_curve
+from app.config import settings
+
+HOUR = 3600
+
+
+def test_occupancy_curve_sweep_line():
+    """
+    Mean and peak concurrency per bin; back-to-back sessions do not overlap.
+    """
+    starts = np.array([0, HOUR, 2 * HOUR, 3 * HOUR])
+    ends = np.array([2 * HOUR, 3 * HOUR, 3 * HOUR, 4 * HOUR])
+
+    curve = occupancy_curve(starts, ends, 0, 4 * HOUR, HOUR)
+
+    assert curve["mean_occupancy"].tolist() == [1.0, 2.0, 2.0, 1.0]
+    assert curve["peak_occupancy"].tolist() == [1, 2, 2, 1]
+    assert curve["peak_concurrency"] == 2
+    assert curve["mean_concurrency"] == 1.5
+
+
+def test_occupancy_curve_partial_bins():
+    """
+    Sessions are clipped to the range and bins that straddle events are time-weighted.
+    """
+    starts = np.array([0, HOUR])
+    ends = np.array([2 * HOUR, 3 * HOUR])
+
+    curve = occupancy_curve(starts, ends, HOUR // 2, 3 * HOUR, HOUR)
+
+    assert curve["bin_starts"].tolist() == [HOUR // 2, 3 * HOUR // 2, 5 * HOUR // 2]
+    assert curve["mean_occupancy"].tolist() == [1.5, 1.5, 1.0]
+    assert curve["busy_hours"].shape == (7, 24)
+
+
+def test_session_intervals_prunes_old_archive_partitions(db_factory, tmp_path, monkeypatch):
+    """
+    Archived months that end before the range (minus the longest session) are not read.
+    """
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "MAX_SESSION_HOURS", 48)
+    table_dir = archive._table_dir(str(tmp_path))
+    for session_id, start in [(1, "2023-01-10T08:00"), (2, "2024-02-29T20:00"), (3, "2024-03-10T09:00")]:
+        start_time = np.array([start], dtype="datetime64[us]")
+        archive._write_part(table_dir, start[:7], {
+            "id": np.array([session_id]), "user_id": np.array([1]), "station_id": np.array([1]),
+            "charger_id": np.array([1]), "start_time": start_time,
+            "end_time": start_time + np.timedelta64(30 if session_id == 2 else 1, "h"),
+            "energy_used": np.array([1.0]), "cost": np.array([0.25]),
+        })
+
+    scanned_months = []
+    parts = archive._parts
+    monkeypatch.setattr(archive, "_parts", lambda *args: scanned_months.append(args[1:]) or parts(*args))
+
+    db = db_factory()
+    starts, ends = analytics.session_intervals(db, 1, datetime(2024, 3, 1), datetime(2024, 3, 11))
+    db.close()
+
+    assert scanned_months == [("2024-02", "2024-03")]
+    assert sorted(starts.tolist()) == analytics.to_seconds(["2024-02-29T20:00", "2024-03-10T09:00"]).tolist()
+
+
+def test_occupancy_curve_simultaneous_ends_on_bin_edge():
+    """
+    Sessions ending together on a bin edge do not leave an intermediate count in the next bin.
+    """
+    curve = occupancy_curve(np.array([0, 0]), np.array([HOUR, HOUR]), 0, 2 * HOUR, HOUR)
+
+    assert curve["peak_occupancy"].tolist() == [2, 0]
+    assert curve["mean_occupancy"].tolist() == [2.0, 0.0]
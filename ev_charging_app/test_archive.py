@@ -0,0 +1,82 @@
+import numpy as np
+from datetime import datetime, timedelta
+from app import archive, models
+
+
+def add_sessions(db, ids):
+    start = datetime(2024, 1, 15, 8)
+    for session_id in ids:
+        db.add(models.ChargingSession(
+            id=session_id, user_id=1, station_id=1, charger_id=1, start_time=start,
+            end_time=start + timedelta(hours=1), energy_used=10.0, cost=2.5, is_active=False,
+        ))
+    db.commit()
+
+
+def test_rerun_after_crash_does_not_duplicate(db_factory, tmp_path):
+    """
+    Sessions written to the archive but not yet deleted from the hot table
+    (a run that stopped in between) are deleted, not archived again.
+    """
+    db = db_factory()
+    add_sessions(db, [1, 2, 3])
+    assert archive.archive_completed_sessions(db, 30, archive_dir=str(tmp_path)) == 3
+
+    # The hot rows come back as if the delete had never been committed
+    add_sessions(db, [1, 2, 3])
+    assert archive.archive_completed_sessions(db, 30, archive_dir=str(tmp_path)) == 0
+
+    assert db.query(models.ChargingSession).count() == 0
+    assert archive.scan_archive(archive_dir=str(tmp_path))["id"].tolist() == [1, 2, 3]
+    db.close()
+
+
+def test_scan_counts_duplicated_sessions_once(tmp_path):
+    """
+    Parts that repeat a session (left by older runs) do not double count it.
+    """
+    table_dir = archive._table_dir(str(tmp_path))
+    start = np.array(["2024-01-15T08:00"], dtype="datetime64[us]")
+    part = {
+        "id": np.array([7]), "user_id": np.array([1]), "station_id": np.array([1]),
+        "charger_id": np.array([1]), "start_time": start, "end_time": start + np.timedelta64(1, "h"),
+        "energy_used": np.array([10.0]), "cost": np.array([2.5]),
+    }
+    archive._write_part(table_dir, "2024-01", part)
+    archive._write_part(table_dir, "2024-01", part)
+
+    scanned = archive.scan_archive(archive_dir=str(tmp_path))
+    assert scanned["id"].tolist() == [7]
+    assert scanned["energy_used"].sum() == 10.0
+
+
+def test_reused_session_id_is_archived(db_factory, tmp_path):
+    """
+    Once the last rows are archived and deleted SQLite hands out their ids
+    again; a new session with a reused id is still written to the archive.
+    """
+    db = db_factory()
+    start = datetime(2024, 1, 15, 8)
+    for user_id in (1, 2):
+        db.add(models.ChargingSession(
+            user_id=user_id, station_id=1, charger_id=1, start_time=start,
+            end_time=start + timedelta(hours=1), energy_used=10.0, cost=2.5, is_active=False,
+        ))
+    db.commit()
+    assert archive.archive_completed_sessions(db, 0, archive_dir=str(tmp_path)) == 2
+
+    later = start + timedelta(days=1)
+    session = models.ChargingSession(
+        user_id=3, station_id=1, charger_id=1, start_time=later,
+        end_time=later + timedelta(hours=1), energy_used=5.0, cost=1.25, is_active=False,
+    )
+    db.add(session)
+    db.commit()
+    assert session.id == 1
+
+    assert archive.archive_completed_sessions(db, 0, archive_dir=str(tmp_path)) == 1
+    assert db.query(models.ChargingSession).count() == 0
+    scanned = archive.scan_archive(archive_dir=str(tmp_path))
+    assert sorted(scanned["user_id"].tolist()) == [1, 2, 3]
+    assert sorted(scanned["id"].tolist()) == [1, 1, 2]
+    db.close()
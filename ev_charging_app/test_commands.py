@@ -0,0 +1,41 @@
+import asyncio
+from sqlalchemy import event
+from app import station
+
+
+def test_command_endpoints_query_off_the_event_loop(client, db_factory, monkeypatch):
+    """
+    Station lookups for remote commands run in the threadpool, not on the
+    event loop that serves the OCPP WebSockets.
+    """
+    on_loop = []
+
+    def record(*args):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+
+    async def send(charge_point_id, action, payload, timeout=None):
+        return {"status": "Accepted"}
+
+    async def broadcast(charge_point_ids, action, payload, timeout=None):
+        return {charge_point_id: {"status": "Accepted"} for charge_point_id in charge_point_ids}
+
+    client.post("/api/stations/", json={"name": "Depot", "location": "Main Street", "power_output": 22.0, "ocpp_id": "CP-1"})
+    monkeypatch.setattr(station.command_router, "send", send)
+    monkeypatch.setattr(station.command_router, "broadcast", broadcast)
+    engine = db_factory.kw["bind"]
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        single = client.post("/api/stations/1/remote-start", json={"id_tag": "TAG"})
+        bulk = client.post("/api/stations/availability", json={"connector_id": 0, "type": "Inoperative"})
+        missing = client.post("/api/stations/99/remote-start", json={"id_tag": "TAG"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert single.json()["charge_point_id"] == "CP-1"
+    assert [result["charge_point_id"] for result in bulk.json()] == ["CP-1"]
+    assert missing.status_code == 404
+    assert on_loop and not any(on_loop)
@@ -0,0 +1,37 @@
+import sqlite3
+import pytest
+from sqlalchemy import create_engine
+from app import database
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """
+    A database from before stations.name and charging_sessions.charger_id existed.
+    """
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE stations (id INTEGER NOT NULL, location VARCHAR, power_output FLOAT, ocpp_id VARCHAR, PRIMARY KEY (id));
+        CREATE TABLE charging_sessions (id INTEGER NOT NULL, user_id INTEGER, station_id INTEGER, PRIMARY KEY (id));
+        """
+    )
+    connection.close()
+    monkeypatch.setattr(database, "engine", create_engine(f"sqlite:///{path}"))
+    monkeypatch.setattr(database, "_schema_ready", False)
+    return path
+
+
+def test_missing_not_null_columns_need_manual_migration(legacy_db):
+    """
+    The upgrade refuses before changing anything and never stamps the version.
+    """
+    before = sqlite3.connect(legacy_db).execute("SELECT sql FROM sqlite_master").fetchall()
+
+    with pytest.raises(RuntimeError, match="Manual migration required.*stations.name"):
+        database.init_database()
+
+    after = sqlite3.connect(legacy_db).execute("SELECT sql FROM sqlite_master").fetchall()
+    assert after == before
+    assert database._schema_ready is False
@@ -0,0 +1,84 @@
+import random
+from app import models
+from app.geo import GridIndex, haversine_km, station_locations
+
+
+def test_nearby_limit():
+    """
+    The limited query returns the same stations as sorting every match.
+    """
+    index = GridIndex()
+    points = {station_id: (52.0 + station_id * 0.01, 13.0 + station_id * 0.007) for station_id in range(1, 200)}
+    for station_id, (lat, lon) in points.items():
+        index.upsert(station_id, lat, lon)
+
+    everything = index.nearby(52.5, 13.3, 50)
+    assert [station_id for station_id, _ in everything] == sorted(
+        (station_id for station_id, point in points.items() if haversine_km(52.5, 13.3, *point) <= 50),
+        key=lambda station_id: haversine_km(52.5, 13.3, *points[station_id]),
+    )
+    assert index.nearby(52.5, 13.3, 50, limit=5) == everything[:5]
+
+
+def test_refresh_picks_up_stations_added_elsewhere(db_factory):
+    """
+    A station written by another worker appears once the index is stale.
+    """
+    index = GridIndex()
+    db = db_factory()
+    index.rebuild(db)
+    db.add(models.Station(name="Depot", location="Main Street 1", power_output=22.0, ocpp_id="CP-1",
+                          latitude=52.52, longitude=13.40))
+    db.commit()
+
+    index.refresh_if_stale(db, max_age=60)
+    assert index.nearby(52.52, 13.40, 1) == []
+
+    index._built_at -= 61
+    index.refresh_if_stale(db, max_age=60)
+    assert [station_id for station_id, _ in index.nearby(52.52, 13.40, 1)] == [1]
+    db.close()
+
+
+def test_available_filter_sees_other_workers(client, db_factory):
+    """
+    Free chargers come from the database, not this worker's bitmap: a station
+    and a session written through another worker are both reflected.
+    """
+    station = {"location": "Main Street", "longitude": 13.40, "power_output": 22.0, "num_chargers": 1}
+    client.post("/api/stations/", json=dict(station, name="Depot A", ocpp_id="CP-A", latitude=52.52))
+    db = db_factory()
+    db.add(models.Station(**dict(station, name="Depot B", ocpp_id="CP-B", latitude=52.53)))
+    db.add(models.ChargingSession(user_id=1, station_id=1, charger_id=1, is_active=True))
+    db.commit()
+    db.close()
+    station_locations._built_at -= 3600
+
+    nearby = client.get("/api/stations/nearby", params={"lat": 52.52, "lon": 13.40, "available": True}).json()
+    assert [(match["name"], match["free_chargers"]) for match in nearby] == [("Depot B", 1)]
+
+
+def test_ring_search_matches_brute_force():
+    """
+    Limited queries (ring search) agree with brute force across the dateline
+    and at high latitudes, where a degree of longitude is short.
+    """
+    rng = random.Random(7)
+    for lat, lon in [(52.5, 13.4), (0.0, 179.95), (-33.9, -179.95), (85.0, 0.0), (89.9, 45.0)]:
+        index = GridIndex()
+        points = {}
+        for station_id in range(1, 400):
+            point = (
+                max(-89.99, min(89.99, lat + rng.uniform(-3, 3))),
+                (lon + rng.uniform(-8, 8) + 180) % 360 - 180,
+            )
+            points[station_id] = point
+            index.upsert(station_id, *point)
+        for radius, limit in [(5, 3), (50, 10), (200, 20)]:
+            expected = sorted(
+                (haversine_km(lat, lon, *point), station_id) for station_id, point in points.items()
+                if haversine_km(lat, lon, *point) <= radius
+            )[:limit]
+            assert [station_id for station_id, _ in index.nearby(lat, lon, radius, limit)] == [
+                station_id for _, station_id in expected
+            ]
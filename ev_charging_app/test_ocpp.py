@@ -1,10 +1,12 @@
 import pytest
 import websockets
 import asyncio
+import json
 from httpx import AsyncClient
 from app.main import app
 from fastapi.testclient import TestClient
-from app.ocpp_server import ocpp_server
+from app.ocpp_server import ocpp_server, ChargePointConnection, CALL, CALLRESULT, CALLERROR
+from app.routing import ChargePointNotConnected, CommandError
 
 
 @pytest.mark.asyncio
@@ -16,40 +18,41 @@ async def test_ocpp_websocket():
 
     async with websockets.connect(uri) as websocket:
         # Send a BootNotification test message
-        boot_notification_message = {
-            "messageTypeId": 2,
-            "uniqueId": "1234",
-            "action": "BootNotification",
-            "payload": {
+        boot_notification_message = [
+            2,
+            "1234",
+            "BootNotification",
+            {
                 "chargePointVendor": "TestVendor",
                 "chargePointModel": "TestModel"
             }
-        }
+        ]
 
-        await websocket.send(str(boot_notification_message))  # Convert dict to string for WebSocket sending
+        await websocket.send(json.dumps(boot_notification_message))
 
         # Receive the response
-        response = await websocket.recv()
+        response = json.loads(await websocket.recv())
 
-        # Parse the response and check its validity
-        assert "Message received" in response
+        # The CALLRESULT must echo the uniqueId of the CALL
+        assert response[:2] == [CALLRESULT, "1234"]
+        assert response[2]["status"] == "Accepted"
 
         # Send another custom message to validate additional behavior
-        custom_message = {
-            "messageTypeId": 2,
-            "uniqueId": "5678",
-            "action": "StatusNotification",
-            "payload": {
+        custom_message = [
+            2,
+            "5678",
+            "StatusNotification",
+            {
                 "connectorId": 1,
                 "status": "Available"
             }
-        }
-        await websocket.send(str(custom_message))
+        ]
+        await websocket.send(json.dumps(custom_message))
 
-        response = await websocket.recv()
+        response = json.loads(await websocket.recv())
 
         # Assert the response matches expected behavior
-        assert "Message received" in response
+        assert response[:2] == [CALLRESULT, "5678"]
 
 
 @pytest.mark.asyncio
@@ -64,7 +67,83 @@ async def test_ocpp_integration():
         async with websockets.connect(uri) as websocket:
             test_message = "Integration Test Message"
             await websocket.send(test_message)
-            response = await websocket.recv()
+            response = json.loads(await websocket.recv())
 
-            # Ensure the OCPP server handles the message correctly
-            assert response == f"Message received: {test_message}"
+            # Ensure the OCPP server rejects frames that are not OCPP-J
+            assert response[0] == CALLERROR
+            assert response[2] == "FormationViolation"
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+
+async def wait_until_sent(websocket, count):
+    """
+    Yield to the event loop until the connection has sent `count` frames.
+    """
+    while len(websocket.sent) < count:
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_correlated():
+    """
+    Results arriving out of order complete the CALL with the same uniqueId.
+    """
+    websocket = FakeWebSocket()
+    connection = ChargePointConnection(websocket, "CP-1", max_inflight=2)
+
+    first = asyncio.create_task(connection.call("RemoteStartTransaction", {"idTag": "A"}, timeout=1))
+    second = asyncio.create_task(connection.call("ChangeAvailability", {"connectorId": 0, "type": "Inoperative"}, timeout=1))
+    await wait_until_sent(websocket, 2)
+    assert [frame[0] for frame in websocket.sent] == [CALL, CALL]
+
+    connection.resolve([CALLRESULT, websocket.sent[1][1], {"status": "Scheduled"}])
+    connection.resolve([CALLERROR, websocket.sent[0][1], "InternalError", "Busy", {}])
+
+    assert await second == {"status": "Scheduled"}
+    with pytest.raises(CommandError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_call_times_out_while_waiting_for_slot():
+    """
+    With one slot in flight, a second call waits and then times out.
+    """
+    websocket = FakeWebSocket()
+    connection = ChargePointConnection(websocket, "CP-2", max_inflight=1)
+
+    pending = asyncio.create_task(connection.call("RemoteStopTransaction", {"transactionId": 1}, timeout=1))
+    await wait_until_sent(websocket, 1)
+    with pytest.raises(CommandError) as exc_info:
+        await connection.call("RemoteStopTransaction", {"transactionId": 2}, timeout=0.05)
+    assert exc_info.value.code == "Timeout"
+    pending.cancel()
+
+
+@pytest.mark.asyncio
+async def test_queued_call_after_close_is_not_sent():
+    """
+    A call still waiting for a slot when the connection closes fails with
+    ChargePointNotConnected instead of sending on the closed socket.
+    """
+    websocket = FakeWebSocket()
+    connection = ChargePointConnection(websocket, "CP-3", max_inflight=1)
+
+    first = asyncio.create_task(connection.call("Reset", {"type": "Soft"}, timeout=1))
+    await wait_until_sent(websocket, 1)
+    queued = asyncio.create_task(connection.call("Reset", {"type": "Hard"}, timeout=1))
+    await asyncio.sleep(0)
+    connection.close()
+
+    with pytest.raises(ChargePointNotConnected):
+        await first
+    with pytest.raises(ChargePointNotConnected):
+        await queued
+    assert len(websocket.sent) == 1
@@ -0,0 +1,55 @@
+from app.ratelimit import TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_lazily():
+    """
+    A burst is admitted, the next request is rejected with a Retry-After,
+    and tokens come back at the configured rate.
+    """
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=3, max_keys=10, clock=clock)
+
+    assert [limiter.acquire("CP-1") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("CP-1") == 0.5
+
+    clock.now = 0.5
+    assert limiter.acquire("CP-1") == 0.0
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_idle_buckets_are_evicted_lru():
+    """
+    The number of tracked clients never exceeds max_keys.
+    """
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2, clock=FakeClock())
+
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")
+    limiter.acquire("c")  # evicts "b", the least recently seen
+
+    assert limiter.stats()["tracked_keys"] == 2
+    assert limiter.acquire("b") == 0.0  # starts again with a full bucket
+
+
+def test_rotating_api_key_does_not_reset_the_bucket(client, monkeypatch):
+    """
+    REST admission is keyed on the client address; an unverified X-API-Key
+    header does not buy a fresh bucket.
+    """
+    from app import main
+    monkeypatch.setattr(main, "api_limiter", TokenBucketLimiter(rate=0.001, burst=2, max_keys=10, clock=FakeClock()))
+
+    statuses = [
+        client.get("/api/monitoring/admission", headers={"X-API-Key": f"key-{i}"}).status_code
+        for i in range(3)
+    ]
+    assert statuses == [200, 200, 429]
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import types
+import pytest
+from app.routing import (
+    ChargePointNotConnected,
+    CommandError,
+    CommandRouter,
+    InMemoryTransport,
+    RedisTransport,
+    UnixSocketTransport,
+)
+
+
+def make_handler(worker_id):
+    async def handler(action, payload, timeout):
+        return {"worker": worker_id, "action": action, "payload": payload}
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_in_memory_forwarding_and_reconnect():
+    """
+    A command sent on one router reaches the charger attached to another, and
+    detaching a replaced connection does not drop the newer one's ownership.
+    """
+    first = CommandRouter(InMemoryTransport(), "mem-1")
+    second = CommandRouter(InMemoryTransport(), "mem-2")
+    await first.start()
+    await second.start()
+    try:
+        old = make_handler("mem-1")
+        new = make_handler("mem-1")
+        await first.attach("CP-MEM", old)
+        await first.attach("CP-MEM", new)  # charger reconnected to the same worker
+        await first.detach("CP-MEM", old)
+
+        result = await second.send("CP-MEM", "Reset", {"type": "Soft"})
+        assert result == {"worker": "mem-1", "action": "Reset", "payload": {"type": "Soft"}}
+
+        await first.detach("CP-MEM", new)
+        with pytest.raises(ChargePointNotConnected):
+            await second.send("CP-MEM", "Reset", {})
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_forwarding(tmp_path):
+    """
+    Commands and charger-side errors travel between two workers over Unix sockets.
+    """
+    first = CommandRouter(UnixSocketTransport(str(tmp_path)), "unix-1")
+    second = CommandRouter(UnixSocketTransport(str(tmp_path)), "unix-2")
+    await first.start()
+    await second.start()
+    try:
+        await first.attach("CP-1", make_handler("unix-1"))
+        result = await second.send("CP-1", "ChangeAvailability", {"connectorId": 0})
+        assert result["worker"] == "unix-1"
+
+        async def rejecting(action, payload, timeout):
+            raise CommandError("Rejected", "Connector busy")
+
+        await first.attach("CP-2", rejecting)
+        with pytest.raises(CommandError) as exc_info:
+            await second.send("CP-2", "RemoteStopTransaction", {"transactionId": 1})
+        assert exc_info.value.code == "Rejected"
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_reconnect_to_another_worker(tmp_path):
+    """
+    When a charger moves to another worker, the old worker's late detach keeps the new claim.
+    """
+    first = CommandRouter(UnixSocketTransport(str(tmp_path)), "unix-1")
+    second = CommandRouter(UnixSocketTransport(str(tmp_path)), "unix-2")
+    await first.start()
+    await second.start()
+    try:
+        old = make_handler("unix-1")
+        await first.attach("CP-1", old)
+        await second.attach("CP-1", make_handler("unix-2"))
+        await first.detach("CP-1", old)
+
+        assert await first.transport.owner("CP-1") == "unix-2"
+        assert (await first.send("CP-1", "Reset", {}))["worker"] == "unix-2"
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_stale_owner(tmp_path):
+    """
+    An ownership record left by a dead worker is reported as not connected.
+    """
+    crashed = CommandRouter(UnixSocketTransport(str(tmp_path)), "unix-dead")
+    survivor = CommandRouter(UnixSocketTransport(str(tmp_path)), "unix-live")
+    await crashed.start()
+    await survivor.start()
+    try:
+        await crashed.attach("CP-1", make_handler("unix-dead"))
+        # Simulate a crash: the listener goes away but the ownership file stays
+        await crashed.transport.stop()
+        with pytest.raises(ChargePointNotConnected):
+            await survivor.send("CP-1", "Reset", {})
+
+        # A leftover socket file with nobody listening behaves the same
+        leftover = socket.socket(socket.AF_UNIX)
+        leftover.bind(os.path.join(str(tmp_path), "unix-dead.sock"))
+        try:
+            with pytest.raises(ChargePointNotConnected):
+                await survivor.send("CP-1", "Reset", {})
+        finally:
+            leftover.close()
+    finally:
+        await survivor.stop()
+
+
+class FakeRedisServer:
+    """
+    Just enough of a Redis server for RedisTransport: hashes and pub/sub.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self.subscribers = {}
+
+    def client(self, url, decode_responses=True):
+        return FakeRedis(self)
+
+
+class FakeRedis:
+    def __init__(self, server):
+        self.server = server
+
+    def pubsub(self):
+        return FakePubSub(self.server)
+
+    async def publish(self, channel, data):
+        queues = self.server.subscribers.get(channel, [])
+        for queue in queues:
+            queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(queues)
+
+    async def hset(self, key, field, value):
+        self.server.hashes.setdefault(key, {})[field] = value
+
+    async def hget(self, key, field):
+        return self.server.hashes.get(key, {}).get(field)
+
+    async def eval(self, script, numkeys, key, field, value):
+        owners = self.server.hashes.get(key, {})
+        if owners.get(field) != value:
+            return 0
+        del owners[field]
+        return 1
+
+    async def close(self):
+        pass
+
+
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.server.subscribers.setdefault(channel, []).append(self.queue)
+            self.queue.put_nowait({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        for queues in self.server.subscribers.values():
+            if self.queue in queues:
+                queues.remove(self.queue)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    server = FakeRedisServer()
+    module = types.ModuleType("redis.asyncio")
+    module.from_url = server.client
+    package = types.ModuleType("redis")
+    package.asyncio = module
+    monkeypatch.setitem(sys.modules, "redis", package)
+    monkeypatch.setitem(sys.modules, "redis.asyncio", module)
+    return server
+
+
+@pytest.mark.asyncio
+async def test_redis_forwarding(fake_redis):
+    """
+    Commands and charger-side errors travel between workers over pub/sub.
+    """
+    first = CommandRouter(RedisTransport("redis://fake"), "redis-1")
+    second = CommandRouter(RedisTransport("redis://fake"), "redis-2")
+    await first.start()
+    await second.start()
+    try:
+        await first.attach("CP-1", make_handler("redis-1"))
+        result = await second.send("CP-1", "Reset", {"type": "Soft"}, timeout=1)
+        assert result == {"worker": "redis-1", "action": "Reset", "payload": {"type": "Soft"}}
+
+        async def rejecting(action, payload, timeout):
+            raise CommandError("Rejected", "Connector busy")
+
+        await first.attach("CP-2", rejecting)
+        with pytest.raises(CommandError) as exc_info:
+            await second.send("CP-2", "RemoteStopTransaction", {"transactionId": 1}, timeout=1)
+        assert exc_info.value.code == "Rejected"
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_redis_listener_survives_malformed_messages(fake_redis, caplog):
+    """
+    Bad messages on the inbox or reply channel are logged and skipped; the
+    listener keeps serving forwards afterwards.
+    """
+    first = CommandRouter(RedisTransport("redis://fake"), "redis-1")
+    second = CommandRouter(RedisTransport("redis://fake"), "redis-2")
+    await first.start()
+    await second.start()
+    try:
+        await first.attach("CP-1", make_handler("redis-1"))
+        publisher = FakeRedis(fake_redis)
+        with caplog.at_level(logging.ERROR, logger="app.routing"):
+            await publisher.publish(RedisTransport._inbox("redis-1"), "not json")
+            await publisher.publish(RedisTransport._inbox("redis-1"), json.dumps({"request_id": "x"}))
+            await publisher.publish(RedisTransport._replies("redis-2"), json.dumps({"reply": {}}))
+            result = await second.send("CP-1", "Reset", {"type": "Soft"}, timeout=1)
+        assert result["worker"] == "redis-1"
+        assert len([record for record in caplog.records if record.levelno == logging.ERROR]) == 3
+    finally:
+        await first.stop()
+        await second.stop()
@@ -0,0 +1,92 @@
+import pytest
+from app import models
+from app.search import PrefixIndex, StationSearch, tokenize
+
+STATIONS = [
+    ("Depot North", "Hauptstrasse 1, München"),
+    ("Depot South", "Bahnhofplatz 2, Berlin"),
+    ("Harbour", "Kai 3, Hamburg"),
+]
+
+
+@pytest.fixture
+def fts(db_factory):
+    """
+    StationSearch on SQLite with the FTS5 table and triggers in place.
+    """
+    db = db_factory()
+    for i, (name, location) in enumerate(STATIONS, start=1):
+        db.add(models.Station(name=name, location=location, power_output=22.0, ocpp_id=f"CP-{i}"))
+    db.commit()
+    search = StationSearch()
+    search.setup(db_factory.kw["bind"], db)
+    assert search.use_fts
+    yield search, db
+    db.close()
+
+
+def test_tokenize_folds_accents():
+    assert tokenize("München, Île-de-France") == ["munchen", "ile", "de", "france"]
+
+
+def test_fts_prefix_and_all_terms(fts):
+    search, db = fts
+    assert sorted(search.search(db, "dep")) == [1, 2]
+    assert search.search(db, "dep sou") == [2]
+    assert search.search(db, "munch") == [1]
+    assert search.search(db, "depot hamburg") == []
+
+
+def test_fts_triggers_follow_updates_and_deletes(fts):
+    search, db = fts
+    station = db.query(models.Station).get(3)
+    station.name = "Ferry Terminal"
+    db.commit()
+    assert search.search(db, "harb") == []
+    assert search.search(db, "ferry") == [3]
+
+    db.delete(station)
+    db.commit()
+    assert search.search(db, "ferry") == []
+
+
+def test_prefix_index_fallback():
+    index = PrefixIndex()
+    for i, (name, location) in enumerate(STATIONS, start=1):
+        index.upsert(i, name, location)
+
+    assert index.search("dep", 10) == [1, 2]
+    assert index.search("dep sou", 10) == [2]
+    assert index.search("munch", 10) == [1]
+
+    index.upsert(3, "Ferry Terminal", "Kai 3, Hamburg")
+    assert index.search("harb", 10) == []
+    index.remove(3)
+    assert index.search("ferry", 10) == []
+
+
+def test_fallback_refresh_picks_up_other_workers(db_factory):
+    """
+    Without FTS5 the per-worker index is reloaded once stale, so stations
+    created or renamed through another worker become searchable.
+    """
+    db = db_factory()
+    search = StationSearch()
+    search.fallback.rebuild(db)
+    db.add(models.Station(name="Depot", location="Main Street", power_output=22.0, ocpp_id="CP-1"))
+    db.commit()
+
+    assert search.search(db, "depot", max_age=60) == []
+    search.fallback._built_at -= 61
+    assert search.search(db, "depot", max_age=60) == [1]
+    db.close()
+
+
+def test_search_endpoint(client):
+    for i, (name, location) in enumerate(STATIONS, start=1):
+        client.post("/api/stations/", json={"name": name, "location": location, "power_output": 22.0, "ocpp_id": f"CP-{i}"})
+
+    found = client.get("/api/stations/search", params={"q": "depot mün"})
+    assert found.status_code == 200
+    assert [station["name"] for station in found.json()] == ["Depot North"]
+    assert client.get("/api/stations/search", params={"q": ""}).status_code == 422
@@ -0,0 +1,56 @@
+import pytest
+from app.config import settings
+
+FAST_ENDPOINTS = {"get_all_sessions", "get_user_sessions", "get_station_sessions", "list_stations"}
+
+
+@pytest.fixture
+def populated(client):
+    """
+    Two stations with an ended and an active (end_time NULL) session, and one without sessions.
+    """
+    stations = [
+        client.post("/api/stations/", json={
+            "name": f"Depot {i}", "location": f"Main Street {i}", "latitude": 52.5 + i / 10, "longitude": 13.4,
+            "power_output": 22.0, "ocpp_id": f"CP-{i}", "num_chargers": 2,
+        }).json()
+        for i in range(3)
+    ]
+    for station in stations[:2]:
+        ended = client.post("/api/sessions/sessions/", json={"user_id": 1, "station_id": station["id"]}).json()
+        client.put(f"/api/sessions/sessions/{ended['id']}/end")
+        client.post("/api/sessions/sessions/", json={"user_id": 2, "station_id": station["id"]})
+    return client
+
+
+@pytest.mark.parametrize("path", [
+    "/api/stations/?limit=10",
+    "/api/stations/?skip=1&limit=1",
+    "/api/sessions/sessions/",
+    "/api/sessions/sessions/user/2",
+    "/api/sessions/sessions/station/1",
+])
+def test_fast_path_matches_response_model(populated, monkeypatch, path):
+    """
+    Column-tuple serialization produces the same JSON, field order included,
+    as the ORM objects validated through response_model.
+    """
+    monkeypatch.setattr(settings, "FAST_JSON_ENDPOINTS", set())
+    expected = populated.get(path)
+    monkeypatch.setattr(settings, "FAST_JSON_ENDPOINTS", FAST_ENDPOINTS)
+    fast = populated.get(path)
+
+    assert fast.status_code == expected.status_code == 200
+    assert fast.json() == expected.json()
+    assert [list(item) for item in fast.json()] == [list(item) for item in expected.json()]
+
+
+def test_fast_path_includes_null_end_time_and_nested_sessions(populated, monkeypatch):
+    """
+    The compared data covers active sessions and stations with and without sessions.
+    """
+    monkeypatch.setattr(settings, "FAST_JSON_ENDPOINTS", FAST_ENDPOINTS)
+    stations = populated.get("/api/stations/?limit=10").json()
+
+    assert [len(station["sessions"]) for station in stations] == [2, 2, 0]
+    assert [session["end_time"] is None for session in stations[0]["sessions"]] == [False, True]
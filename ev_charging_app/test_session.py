@@ -0,0 +1,89 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session as SqlSession
+from app import models
+from app.availability import ChargerAvailability, charger_availability
+from app.main import app
+
+STATION = {
+    "name": "Depot",
+    "location": "Main Street 1",
+    "power_output": 22.0,
+    "ocpp_id": "CP-1",
+    "num_chargers": 1,
+}
+
+
+def test_ending_a_session_frees_the_charger(client):
+    """
+    start -> end -> start on the same charger: ending must release the reservation.
+    """
+    station = client.post("/api/stations/", json=STATION).json()
+    session = {"user_id": 1, "station_id": station["id"], "charger_id": 1}
+
+    first = client.post("/api/sessions/sessions/", json=session)
+    assert first.status_code == 200
+    assert client.post("/api/sessions/sessions/", json=session).status_code == 409
+
+    ended = client.put(f"/api/sessions/sessions/{first.json()['id']}/end")
+    assert ended.status_code == 200
+    assert ended.json()["is_active"] is False
+    assert ended.json()["end_time"] is not None
+    assert ended.json()["cost"] >= 0
+
+    second = client.post("/api/sessions/sessions/", json=session)
+    assert second.status_code == 200
+    assert second.json()["charger_id"] == 1
+
+
+def test_station_report_rejects_malformed_dates(client, tmp_path, monkeypatch):
+    """
+    Report dates are validated by FastAPI (422) instead of failing inside the handler.
+    """
+    from app.config import settings
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    station = client.post("/api/stations/", json=STATION).json()
+
+    assert client.get(f"/api/stations/{station['id']}/report", params={"start_date": "yesterday"}).status_code == 422
+    report = client.get(
+        f"/api/stations/{station['id']}/report",
+        params={"start_date": "2024-01-01T00:00:00+02:00", "end_date": "2024-02-01T00:00:00"},
+    )
+    assert report.status_code == 200
+    assert report.json()["total_sessions"] == 0
+
+
+def test_stale_bitmap_moves_to_next_charger(client, db_factory):
+    """
+    Two workers share one database: this worker's bitmap misses the session
+    the other booked, hits the unique index and takes the next charger.
+    """
+    station = client.post("/api/stations/", json=dict(STATION, num_chargers=2)).json()
+    other_worker = ChargerAvailability()
+    db = db_factory()
+    charger_id = other_worker.reserve(station["id"], 2)
+    db.add(models.ChargingSession(user_id=9, station_id=station["id"], charger_id=charger_id, is_active=True))
+    db.commit()
+    db.close()
+
+    session = {"user_id": 1, "station_id": station["id"]}
+    started = client.post("/api/sessions/sessions/", json=session)
+    assert started.status_code == 200
+    assert started.json()["charger_id"] == 2
+    assert client.post("/api/sessions/sessions/", json=session).status_code == 409
+    assert charger_availability.free_count(station["id"]) == 0
+
+
+def test_failed_commit_frees_the_charger(client, monkeypatch):
+    """
+    A commit failing for another reason than the unique index releases the reservation.
+    """
+    station = client.post("/api/stations/", json=STATION).json()
+
+    def locked(self):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(SqlSession, "commit", locked)
+    failing = TestClient(app, raise_server_exceptions=False)
+    assert failing.post("/api/sessions/sessions/", json={"user_id": 1, "station_id": station["id"]}).status_code == 500
+    assert charger_availability.free_count(station["id"]) == 1